@@ -1,10 +1,37 @@
 # api.py
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
-import oracledb
-from datetime import datetime, timedelta, date
-from collections import defaultdict
+from fastapi import FastAPI, HTTPException, Query, Request, Response, UploadFile, File
+from pydantic import BaseModel, Field, ValidationError
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Match
+from typing import List, Optional, Literal
+from datetime import datetime, date
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import contextvars
+import functools
+import base64
+import csv
+import io
+import os
+import threading
+import asyncio
+import time
+
+import cache
+import export
+import fastjson
+import jobs
+import metrics
+import reports
+import repository
+import risk
+import risk_parallel
+import risk_rules
+import risk_state
+import risk_vectorized
+import rollup
+import slowlog
+import storage
 
 app = FastAPI(
     title="Insurance Claims API",
@@ -12,19 +39,243 @@ app = FastAPI(
     version="1.2.1"
 )
 
-# --- Oracle DB Configuration ---
-DB_USER = "system"
-DB_PASSWORD = "shardul"  
-DB_DSN = "localhost:1521/FREE"  
+# --- Storage Configuration ---
+# STORAGE_BACKEND selects Oracle (default) or an embedded SQLite file; connection and pool
+# settings (DB_USER, DB_DSN, DB_POOL_*, SQLITE_PATH) are read by storage.create_backend().
+backend = storage.get_backend()
+
+# --- Pagination Configuration ---
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Rows fetched per round trip by the streaming export endpoints.
+EXPORT_FETCH_ARRAYSIZE = int(os.getenv("EXPORT_FETCH_ARRAYSIZE", "1000"))
+
+# Rows inserted per executemany() call (and per commit) by the bulk endpoints.
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+
+# Per-line rejects listed in a policyholder import response (all are still counted).
+IMPORT_MAX_REPORTED_ERRORS = int(os.getenv("IMPORT_MAX_REPORTED_ERRORS", "1000"))
+
+# Analytics (risk analysis, reports, risk window maintenance) run on their own small executor so
+# slow reports never occupy the threads or pooled connections that serve claim writes.
+ANALYTICS_WORKERS = int(os.getenv("ANALYTICS_WORKERS", "2"))
+analytics_executor = ThreadPoolExecutor(max_workers=ANALYTICS_WORKERS, thread_name_prefix="analytics")
+
+async def run_analytics(func, *args):
+    """Runs a blocking analytics call on the analytics executor without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    # run_in_executor does not carry context variables over, so the request's timings are passed explicitly.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(analytics_executor, functools.partial(context.run, func, *args))
+
+# Report queries run concurrently, each on its own pooled connection.
+REPORT_QUERY_WORKERS = int(os.getenv("REPORT_QUERY_WORKERS", "4"))
+report_query_executor = ThreadPoolExecutor(max_workers=REPORT_QUERY_WORKERS, thread_name_prefix="report-query")
+
+# Background analytics jobs (/jobs/...) run on a bounded pool of their own; beyond
+# JOB_WORKERS running and JOB_MAX_PENDING queued jobs new ones are refused with 503.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "8"))
+job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+_job_slots = threading.BoundedSemaphore(JOB_WORKERS + JOB_MAX_PENDING)
+
+# --- Response Cache Configuration ---
+# Analytics responses are cached until a write bumps the version of a table they read, or the
+# TTL passes. Set RESPONSE_CACHE_SHARED_PATH to share the cache between workers on one machine.
+response_cache = cache.ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256")),
+    ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30")),
+    shared_path=os.getenv("RESPONSE_CACHE_SHARED_PATH") or None
+)
+
+# Finished jobs keep the last JOB_SNAPSHOT_RETENTION results per kind and parameters. Set
+# JOB_STORE_SHARED_PATH so every worker on one machine can serve every job and snapshot.
+job_store = jobs.JobStore(
+    max_jobs=int(os.getenv("JOB_HISTORY_MAX", "1000")),
+    snapshot_retention=int(os.getenv("JOB_SNAPSHOT_RETENTION", "5")),
+    shared_path=os.getenv("JOB_STORE_SHARED_PATH") or None
+)
+
+async def cached_analytics(name, tables, func, *args):
+    """Serves func(*args) from the response cache, computing it on the analytics executor on a miss."""
+    # The key is taken before computing so a write that lands mid-computation invalidates the result.
+    key = response_cache.key(name, tables, *args)
+    hit, value = response_cache.get(key)
+    if hit:
+        return value
+    value = await run_analytics(func, *args)
+    response_cache.set(key, value)
+    return value
+
+# Tables each cached/ETagged response is derived from.
+RISK_ANALYSIS_TABLES = ("policyholders", "claims", "risk_window")
+# Risk responses also depend on the rule set, which can differ between deployments sharing a cache.
+RISK_RULES_FINGERPRINT = risk_rules.active.fingerprint
+REPORTS_TABLES = ("policyholders", "claims")
+
+def etag_matches(request, etag):
+    """True when the client's If-None-Match already names `etag`."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (tag.strip() for tag in header.split(","))
+
+def conditional(request, response, name, tables, *params):
+    """
+    Sets the ETag for a response derived from `tables`. Returns a 304 response to send instead
+    when the client already holds that version, otherwise None.
+    """
+    etag = response_cache.etag(name, tables, *params)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
+
+# How often the rolling risk window is checked for claims that have aged out.
+RISK_WINDOW_REFRESH_SECONDS = int(os.getenv("RISK_WINDOW_REFRESH_SECONDS", "3600"))
+
+# Rows fetched per round trip when streaming claims through the risk engine.
+RISK_FETCH_ARRAYSIZE = int(os.getenv("RISK_FETCH_ARRAYSIZE", "5000"))
+
+# mode=parallel scores policyholder ID-range shards in worker processes. More shards than
+# workers evens out shards with unusually many claims. The pool is started on first use.
+RISK_PARALLEL_WORKERS = int(os.getenv("RISK_PARALLEL_WORKERS", str(os.cpu_count() or 1)))
+RISK_PARALLEL_SHARDS = int(os.getenv("RISK_PARALLEL_SHARDS", str(RISK_PARALLEL_WORKERS * 4)))
+risk_process_executor = None
+_risk_process_lock = threading.Lock()
+
+def get_risk_process_executor():
+    global risk_process_executor
+    with _risk_process_lock:
+        if risk_process_executor is None:
+            risk_process_executor = risk_parallel.create_executor(RISK_PARALLEL_WORKERS)
+    return risk_process_executor
+
+def replace_broken_risk_process_executor(broken):
+    """Drops a pool whose worker died (e.g. OOM-killed) so the next call starts a new one."""
+    global risk_process_executor
+    with _risk_process_lock:
+        if risk_process_executor is broken:
+            risk_process_executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
 
-# --- Oracle DB Connection ---
+_pool_lock = threading.Lock()
+_pool_wait_stats = {"acquired": 0, "failures": 0, "total_wait_ms": 0.0, "max_wait_ms": 0.0}
+
+@app.on_event("startup")
+def open_pool():
+    try:
+        backend.open()
+    except storage.Error as e:
+        # The pool is retried lazily by get_connection() once the database is reachable.
+        print(f"Pool Creation Error ({backend.name}): {e}")
+
+@app.on_event("shutdown")
+def close_pool():
+    if _risk_window_task is not None:
+        _risk_window_task.cancel()
+    analytics_executor.shutdown(wait=False, cancel_futures=True)
+    report_query_executor.shutdown(wait=False, cancel_futures=True)
+    job_executor.shutdown(wait=False, cancel_futures=True)
+    with _jobs_lock:
+        unfinished = list(_jobs_in_process)
+    for job_id in unfinished:
+        # Otherwise they would stay active in a shared store and absorb every resubmission.
+        job_store.fail(job_id, "The server shut down before the job finished.")
+    if risk_process_executor is not None:
+        risk_process_executor.shutdown(wait=False, cancel_futures=True)
+    backend.close()
+
+# --- Risk Window Maintenance ---
+_risk_window_task = None
+_risk_window_refreshed_for = None
+
+def risk_window_is_current():
+    return risk.window_start() == _risk_window_refreshed_for
+
+def refresh_risk_window():
+    """
+    Recounts recent approved claims once per day the rolling window moves. Besides the periodic
+    loop, risk reads call it first, so the state never lags the day or a failed refresh.
+    """
+    global _risk_window_refreshed_for
+    window_start = risk.window_start()
+    if window_start == _risk_window_refreshed_for:
+        return
+    conn = None
+    try:
+        conn = get_connection()
+        risk_state.refresh_window(conn)
+        _risk_window_refreshed_for = window_start
+        response_cache.bump("risk_window")
+    except HTTPException:
+        pass  # Pool unavailable; retried on the next tick.
+    except storage.DatabaseError as e_db:
+        _, message = storage.error_info(e_db)
+        print(f"Database Error refreshing risk window: {message}")
+        if conn: conn.rollback()
+    finally:
+        if conn: conn.close()
+
+async def _risk_window_loop():
+    while True:
+        await run_analytics(refresh_risk_window)
+        await asyncio.sleep(RISK_WINDOW_REFRESH_SECONDS)
+
+@app.on_event("startup")
+async def start_risk_window_refresh():
+    global _risk_window_task
+    _risk_window_task = asyncio.create_task(_risk_window_loop())
+
+# --- DB Connection ---
 def get_connection():
+    """Borrows a connection from the backend's shared pool. Closing it returns it to the pool."""
+    started = time.perf_counter()
     try:
-        conn = oracledb.connect(user=DB_USER, password=DB_PASSWORD, dsn=DB_DSN)
-        return conn
-    except oracledb.Error as e:
-        print(f"Oracle Connection Error: {e}")
+        conn = backend.acquire()
+    except storage.Error as e:
+        with _pool_lock:
+            _pool_wait_stats["failures"] += 1
+        print(f"Database Connection Error ({backend.name}): {e}")
         raise HTTPException(status_code=503, detail="Database connection unavailable.")
+    waited = time.perf_counter() - started
+    metrics.record_db_time("acquire", waited)
+    waited_ms = waited * 1000
+    with _pool_lock:
+        _pool_wait_stats["acquired"] += 1
+        _pool_wait_stats["total_wait_ms"] += waited_ms
+        _pool_wait_stats["max_wait_ms"] = max(_pool_wait_stats["max_wait_ms"], waited_ms)
+    return metrics.InstrumentedConnection(conn)
+
+# --- Request Metrics ---
+def route_template(request):
+    """The matched route's path template (e.g. /claims/), so metrics stay one series per route."""
+    for route in request.app.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Latency histogram and in-flight gauge per route, plus a Server-Timing header with DB phases."""
+    route = route_template(request)
+    timings = metrics.RequestTimings()
+    token = metrics.current_timings.set(timings)
+    metrics.REQUESTS_IN_FLIGHT.inc(route)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["Server-Timing"] = timings.server_timing(time.perf_counter() - started)
+        return response
+    finally:
+        metrics.REQUESTS_IN_FLIGHT.dec(route)
+        metrics.REQUEST_LATENCY.observe(time.perf_counter() - started, route, request.method, str(status))
+        metrics.current_timings.reset(token)
 
 # --- Pydantic Models ---
 class PolicyholderBase(BaseModel):
@@ -39,6 +290,18 @@ class PolicyholderIn(PolicyholderBase):
 class PolicyholderOut(PolicyholderBase):
     id: int
 
+class ImportRowError(BaseModel):
+    line: int  # Line number in the uploaded file
+    message: str
+
+class PolicyholderImportOut(BaseModel):
+    rows_read: int
+    inserted: int
+    rejected: int
+    elapsed_seconds: float
+    rows_per_second: float
+    errors: List[ImportRowError]  # Capped at IMPORT_MAX_REPORTED_ERRORS entries
+
 class ClaimBase(BaseModel):
     policyholder_id: int = Field(..., example=1)
     amount: float = Field(..., gt=0, example=1250.75)
@@ -53,6 +316,47 @@ class ClaimOut(ClaimBase):
     id: int
     date_of_claim: str 
 
+class BulkRowError(BaseModel):
+    index: int  # Position of the row in the submitted list
+    code: int
+    message: str
+
+class ClaimBulkOut(BaseModel):
+    inserted: int
+    ids: List[Optional[int]]  # Generated ID per submitted row, None where the row was rejected
+    errors: List[BulkRowError]
+
+class RiskBatchIn(BaseModel):
+    policyholder_ids: List[int] = Field(..., min_items=1, max_items=1000, example=[1, 2, 3])
+
+class SlowQueryLogSettings(BaseModel):
+    # Fields left out of a PUT keep their current value.
+    enabled: Optional[bool] = None
+    threshold_ms: Optional[float] = Field(None, ge=0)
+    explain: Optional[bool] = None  # Capture EXPLAIN PLAN output for slow statements
+
+# --- Claim Write Maintenance ---
+def apply_claim_writes(cur, claims):
+    """
+    Folds freshly inserted (claim_id, policyholder_id, amount, status, date_of_claim) tuples into
+    the derived tables (risk state, monthly rollup) inside the caller's transaction.
+    """
+    risk_state.apply_claims(cur, claims)
+    rollup.apply_claims(cur, claims)
+
+# --- Keyset Pagination Helpers ---
+def encode_claim_cursor(date_of_claim, claim_id):
+    """Opaque token for the (date_of_claim, id) position of the last claim on a page."""
+    raw = f"{date_of_claim.isoformat()}|{claim_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_claim_cursor(cursor):
+    try:
+        raw_date, raw_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(raw_date), int(raw_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+
 # --- API Endpoints ---
 
 @app.post("/policyholders/", response_model=PolicyholderOut, status_code=201, tags=["Policyholders"])
@@ -63,26 +367,17 @@ def create_policyholder(ph: PolicyholderIn):
     try:
         conn = get_connection()
         cur = conn.cursor()
-        ph_id_var = cur.var(oracledb.NUMBER)
-        cur.execute("""
-            INSERT INTO policyholders (name, age, policy_type, sum_insured)
-            VALUES (:name, :age, :policy_type, :sum_insured)
-            RETURNING id INTO :out_id
-        """, {
-            'name': ph.name, 'age': ph.age, 'policy_type': ph.policy_type,
-            'sum_insured': ph.sum_insured, 'out_id': ph_id_var
-        })
-        ph_id_result = ph_id_var.getvalue()
-        if ph_id_result is None or not ph_id_result:
+        ph_id = repository.insert_policyholder(cur, ph)
+        if ph_id is None:
             raise HTTPException(status_code=500, detail="Failed to retrieve policyholder ID after insert.")
-        ph_id = ph_id_result[0]
         conn.commit()
+        response_cache.bump("policyholders")
         return {**ph.dict(), "id": ph_id}
-    except oracledb.DatabaseError as e_db:
-        error_obj, = e_db.args
-        print(f"Oracle Error creating policyholder: {error_obj.message} (Code: {error_obj.code})")
+    except storage.DatabaseError as e_db:
+        code, message = storage.error_info(e_db)
+        print(f"Database Error creating policyholder: {message} (Code: {code})")
         if conn: conn.rollback()
-        raise HTTPException(status_code=500, detail=f"Database error creating policyholder: {error_obj.message}")
+        raise HTTPException(status_code=500, detail=f"Database error creating policyholder: {message}")
     except Exception as e_general:
         print(f"General Error creating policyholder: {str(e_general)}")
         raise HTTPException(status_code=500, detail=f"An unexpected server error occurred: {type(e_general).__name__}")
@@ -90,24 +385,122 @@ def create_policyholder(ph: PolicyholderIn):
         if cur: cur.close()
         if conn: conn.close()
 
+@app.post("/policyholders/import", response_model=PolicyholderImportOut, tags=["Policyholders"])
+def import_policyholders(file: UploadFile = File(...)):
+    """
+    Registers policyholders from a CSV upload with a name,age,policy_type,sum_insured header.
+    The file is parsed as a stream, each row is validated like POST /policyholders/, and valid
+    rows are inserted BULK_CHUNK_SIZE at a time with one commit per batch.
+    """
+    started = time.perf_counter()
+    rows_read = 0
+    inserted = 0
+    rejected = 0
+    errors = []
+
+    def reject(line, message):
+        nonlocal rejected
+        rejected += 1
+        if len(errors) < IMPORT_MAX_REPORTED_ERRORS:
+            errors.append({'line': line, 'message': message})
+
+    conn = None
+    cur = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+
+        def flush(batch):
+            nonlocal inserted
+            if not batch:
+                return
+            batch_errors = repository.insert_policyholders(cur, [binds for _, binds in batch])
+            for offset, _, message in batch_errors:
+                reject(batch[offset][0], message)
+            inserted += len(batch) - len(batch_errors)
+            conn.commit()
+            response_cache.bump("policyholders")
+
+        reader = csv.DictReader(io.TextIOWrapper(file.file, encoding="utf-8-sig", newline=""))
+        batch = []
+        for row in reader:
+            rows_read += 1
+            if None in row:  # DictReader files fields beyond the header under None
+                reject(reader.line_num, f"Expected {len(reader.fieldnames)} fields, got {len(reader.fieldnames) + len(row[None])}")
+                continue
+            try:
+                ph = PolicyholderBase(**row)
+            except ValidationError as e_validation:
+                reject(reader.line_num, "; ".join(
+                    f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e_validation.errors()
+                ))
+                continue
+            batch.append((reader.line_num, ph.dict()))
+            if len(batch) >= BULK_CHUNK_SIZE:
+                flush(batch)
+                batch = []
+        flush(batch)
+
+        elapsed = time.perf_counter() - started
+        return {
+            'rows_read': rows_read,
+            'inserted': inserted,
+            'rejected': rejected,
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(rows_read / elapsed, 1) if elapsed > 0 else 0.0,
+            'errors': errors
+        }
+    except (UnicodeDecodeError, csv.Error) as e_parse:
+        if conn: conn.rollback()
+        raise HTTPException(status_code=400, detail=f"Could not parse CSV after {rows_read} rows ({inserted} inserted): {e_parse}")
+    except storage.DatabaseError as e_db:
+        code, message = storage.error_info(e_db)
+        print(f"Database Error importing policyholders: {message} (Code: {code})")
+        if conn: conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error importing policyholders after {inserted} rows: {message}")
+    except Exception as e_general:
+        print(f"General Error importing policyholders: {str(e_general)}")
+        if conn: conn.rollback()
+        raise HTTPException(status_code=500, detail=f"An unexpected server error occurred: {type(e_general).__name__}")
+    finally:
+        if cur: cur.close()
+        if conn: conn.close()
+
 @app.get("/policyholders/", response_model=List[PolicyholderOut], tags=["Policyholders"])
-def list_policyholders():
-    """Retrieves a list of all policyholders."""
+def list_policyholders(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after_id: Optional[int] = None
+):
+    """
+    Retrieves one page of policyholders ordered by ID.
+    Pass the `X-Next-Cursor` response header back as `after_id` to get the next page.
+    Supports conditional requests via `If-None-Match`.
+    """
+    not_modified = conditional(request, response, "policyholders", ("policyholders",), limit, after_id)
+    if not_modified:
+        return not_modified
     conn = None
     cur = None
     try:
         conn = get_connection()
         cur = conn.cursor()
-        cur.execute("SELECT id, name, age, policy_type, sum_insured FROM policyholders ORDER BY id")
-        rows = cur.fetchall()
+        # One extra row tells us whether another page follows.
+        rows = repository.list_policyholders(cur, limit + 1, after_id)
+        if len(rows) > limit:
+            rows = rows[:limit]
+            response.headers[NEXT_CURSOR_HEADER] = str(rows[-1][0])
+        if fastjson.enabled:
+            return fastjson.respond(fastjson.rows_as_dicts(export.POLICYHOLDER_COLUMNS, rows), response)
         return [
             {"id": r[0], "name": r[1], "age": r[2], "policy_type": r[3], "sum_insured": r[4]}
             for r in rows
         ]
-    except oracledb.DatabaseError as e_db:
-        error_obj, = e_db.args
-        print(f"Oracle Error listing policyholders: {error_obj.message}")
-        raise HTTPException(status_code=500, detail=f"Database error listing policyholders: {error_obj.message}")
+    except storage.DatabaseError as e_db:
+        _, message = storage.error_info(e_db)
+        print(f"Database Error listing policyholders: {message}")
+        raise HTTPException(status_code=500, detail=f"Database error listing policyholders: {message}")
     except Exception as e_general:
         print(f"General Error listing policyholders: {str(e_general)}")
         raise HTTPException(status_code=500, detail=f"An unexpected server error occurred: {type(e_general).__name__}")
@@ -123,29 +516,20 @@ def create_claim(cl: ClaimIn):
     try:
         conn = get_connection()
         cur = conn.cursor()
-        cl_id_var = cur.var(oracledb.NUMBER)
-        cur.execute("""
-            INSERT INTO claims (policyholder_id, amount, reason, status, date_of_claim)
-            VALUES (:policyholder_id, :amount, :reason, :status, :date_of_claim)
-            RETURNING id INTO :out_id
-        """, {
-            'policyholder_id': cl.policyholder_id, 'amount': cl.amount, 'reason': cl.reason,
-            'status': cl.status, 'date_of_claim': cl.date_of_claim,
-            'out_id': cl_id_var
-        })
-        cl_id_result = cl_id_var.getvalue()
-        if cl_id_result is None or not cl_id_result:
+        cl_id = repository.insert_claim(cur, cl)
+        if cl_id is None:
             raise HTTPException(status_code=500, detail="Failed to retrieve claim ID after insert.")
-        cl_id = cl_id_result[0]
+        apply_claim_writes(cur, [(cl_id, cl.policyholder_id, cl.amount, cl.status, cl.date_of_claim)])
         conn.commit()
+        response_cache.bump("claims")
         return {**cl.dict(), "id": cl_id, "date_of_claim": cl.date_of_claim.isoformat()}
-    except oracledb.DatabaseError as e_db:
-        error_obj, = e_db.args
-        print(f"Oracle Error creating claim: {error_obj.message} (Code: {error_obj.code})")
+    except storage.DatabaseError as e_db:
+        code, message = storage.error_info(e_db)
+        print(f"Database Error creating claim: {message} (Code: {code})")
         if conn: conn.rollback()
-        if error_obj.code == 2291:
+        if code == storage.FOREIGN_KEY_VIOLATION:
              raise HTTPException(status_code=404, detail=f"Policyholder with ID {cl.policyholder_id} not found.")
-        raise HTTPException(status_code=500, detail=f"Database error creating claim: {error_obj.message}")
+        raise HTTPException(status_code=500, detail=f"Database error creating claim: {message}")
     except Exception as e_general:
         print(f"General Error creating claim: {str(e_general)}")
         raise HTTPException(status_code=500, detail=f"An unexpected server error occurred: {type(e_general).__name__}")
@@ -153,16 +537,86 @@ def create_claim(cl: ClaimIn):
         if cur: cur.close()
         if conn: conn.close()
 
+@app.post("/claims/bulk", response_model=ClaimBulkOut, status_code=201, tags=["Claims"])
+def create_claims_bulk(claims: List[ClaimIn]):
+    """
+    Submits many claims at once using array DML. Rows are inserted BULK_CHUNK_SIZE at a time
+    with one commit per chunk; rows the database rejects (e.g. unknown policyholder) are
+    reported individually and do not fail the rest of the batch.
+    """
+    ids = [None] * len(claims)
+    errors = []
+    conn = None
+    cur = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        for start in range(0, len(claims), BULK_CHUNK_SIZE):
+            chunk = claims[start:start + BULK_CHUNK_SIZE]
+            chunk_ids, chunk_errors = repository.insert_claims(cur, chunk)
+
+            for offset, code, message in chunk_errors:
+                cl = chunk[offset]
+                if code == storage.FOREIGN_KEY_VIOLATION:
+                    message = f"Policyholder with ID {cl.policyholder_id} not found."
+                errors.append({'index': start + offset, 'code': code, 'message': message})
+
+            inserted = []
+            for offset, (cl, cl_id) in enumerate(zip(chunk, chunk_ids)):
+                if cl_id is None:
+                    continue
+                ids[start + offset] = cl_id
+                inserted.append((cl_id, cl.policyholder_id, cl.amount, cl.status, cl.date_of_claim))
+            apply_claim_writes(cur, inserted)
+            conn.commit()
+            response_cache.bump("claims")
+
+        return {
+            'inserted': sum(1 for cl_id in ids if cl_id is not None),
+            'ids': ids,
+            'errors': sorted(errors, key=lambda e: e['index'])
+        }
+    except storage.DatabaseError as e_db:
+        code, message = storage.error_info(e_db)
+        print(f"Database Error bulk creating claims: {message} (Code: {code})")
+        if conn: conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error creating claims: {message}")
+    except Exception as e_general:
+        print(f"General Error bulk creating claims: {str(e_general)}")
+        if conn: conn.rollback()
+        raise HTTPException(status_code=500, detail=f"An unexpected server error occurred: {type(e_general).__name__}")
+    finally:
+        if cur: cur.close()
+        if conn: conn.close()
+
 @app.get("/claims/", response_model=List[ClaimOut], tags=["Claims"])
-def list_claims():
-    """Retrieves a list of all claims."""
+def list_claims(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    """
+    Retrieves one page of claims, newest first (by date of claim, then ID).
+    Pass the `X-Next-Cursor` response header back as `cursor` to get the next page.
+    Supports conditional requests via `If-None-Match`.
+    """
+    after = decode_claim_cursor(cursor) if cursor else None
+    not_modified = conditional(request, response, "claims", ("claims",), limit, cursor)
+    if not_modified:
+        return not_modified
     conn = None
     cur = None
     try:
         conn = get_connection()
         cur = conn.cursor()
-        cur.execute("SELECT id, policyholder_id, amount, reason, status, date_of_claim FROM claims ORDER BY date_of_claim DESC, id DESC")
-        rows = cur.fetchall()
+        # One extra row tells us whether another page follows.
+        rows = repository.list_claims(cur, limit + 1, after)
+        if len(rows) > limit:
+            rows = rows[:limit]
+            response.headers[NEXT_CURSOR_HEADER] = encode_claim_cursor(rows[-1][5], rows[-1][0])
+        if fastjson.enabled:
+            return fastjson.respond(fastjson.rows_as_dicts(export.CLAIM_COLUMNS, rows), response)
         return [
             {
                 "id": r[0], "policyholder_id": r[1], "amount": r[2], "reason": r[3],
@@ -171,10 +625,10 @@ def list_claims():
             }
             for r in rows
         ]
-    except oracledb.DatabaseError as e_db:
-        error_obj, = e_db.args
-        print(f"Oracle Error listing claims: {error_obj.message}")
-        raise HTTPException(status_code=500, detail=f"Database error listing claims: {error_obj.message}")
+    except storage.DatabaseError as e_db:
+        _, message = storage.error_info(e_db)
+        print(f"Database Error listing claims: {message}")
+        raise HTTPException(status_code=500, detail=f"Database error listing claims: {message}")
     except Exception as e_general:
         print(f"General Error listing claims: {str(e_general)}")
         raise HTTPException(status_code=500, detail=f"An unexpected server error occurred: {type(e_general).__name__}")
@@ -183,138 +637,143 @@ def list_claims():
         if conn: conn.close()
 
 
+def _stream_export(sql, columns, fmt, name):
+    conn = get_connection()
+    cur = None
+    try:
+        cur = conn.cursor()
+        backend.tune_cursor(cur, EXPORT_FETCH_ARRAYSIZE)
+        cur.execute(sql)
+    except storage.DatabaseError as e_db:
+        _, message = storage.error_info(e_db)
+        print(f"Database Error exporting {name}: {message}")
+        if cur: cur.close()
+        conn.close()
+        raise HTTPException(status_code=500, detail=f"Database error exporting {name}: {message}")
+    # From here on the generator owns the cursor and connection.
+    return StreamingResponse(
+        export.stream_rows(conn, cur, columns, fmt),
+        media_type=export.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'}
+    )
+
+@app.get("/export/claims", tags=["Export"])
+def export_claims(format: Literal["ndjson", "csv"] = "ndjson"):
+    """Streams every claim as NDJSON or CSV without materializing the table in memory."""
+    return _stream_export(repository.EXPORT_CLAIMS_SQL, export.CLAIM_COLUMNS, format, "claims")
+
+@app.get("/export/policyholders", tags=["Export"])
+def export_policyholders(format: Literal["ndjson", "csv"] = "ndjson"):
+    """Streams every policyholder as NDJSON or CSV without materializing the table in memory."""
+    return _stream_export(repository.EXPORT_POLICYHOLDERS_SQL, export.POLICYHOLDER_COLUMNS, format, "policyholders")
+
+@app.get("/dashboard/summary", tags=["Analysis & Reports"])
+async def dashboard_summary(request: Request, response: Response):
+    """Policyholder count, claim count and claim counts per status, from one grouped query."""
+    not_modified = conditional(request, response, "dashboard_summary", REPORTS_TABLES)
+    if not_modified:
+        return not_modified
+    return await cached_analytics("dashboard_summary", REPORTS_TABLES, compute_dashboard_summary)
+
+def compute_dashboard_summary():
+    conn = None
+    cur = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        policyholder_count, claims_by_status = repository.dashboard_counts(cur)
+        return {
+            'policyholders': policyholder_count,
+            'claims': sum(claims_by_status.values()),
+            'pending': claims_by_status.get('Pending', 0),
+            'approved': claims_by_status.get('Approved', 0),
+            'rejected': claims_by_status.get('Rejected', 0),
+            'claims_by_status': claims_by_status
+        }
+    except storage.DatabaseError as e_db:
+        _, message = storage.error_info(e_db)
+        print(f"Database Error in dashboard summary: {message}")
+        raise HTTPException(status_code=500, detail=f"Database error building dashboard summary: {message}")
+    except Exception as e_general:
+        print(f"General Error in dashboard summary: {str(e_general)}")
+        raise HTTPException(status_code=500, detail=f"An unexpected server error occurred: {type(e_general).__name__}")
+    finally:
+        if cur: cur.close()
+        if conn: conn.close()
+
 @app.get("/risk_analysis/", tags=["Analysis & Reports"])
-async def risk_analysis_endpoint():
+async def risk_analysis_endpoint(
+    request: Request, response: Response, mode: Literal["state", "full", "vectorized", "parallel"] = "state"
+):
     """
     Performs risk analysis on policyholders based on their claims history.
     - Identifies policyholders with rejected claims > 80% of sum insured (assessment skipped for these).
     - Flags high-risk policyholders based on:
         1. More than 3 approved claims in the last year.
         2. An approved claim amount exceeding 80% of their sum insured.
+      These are the default thresholds; RISK_RULES_PATH can change them per policy type (see /risk_rules).
     - Provides a summary of approved claims by policy type.
     - Provides a summary of ALL claims by policy type.
+
+    By default the report is read from the incrementally maintained risk state table;
+    `mode=full` recomputes it from the complete claims history instead, and `mode=vectorized`
+    does the same recomputation with NumPy array operations (same response, for very large
+    claim sets; requires NumPy). `mode=parallel` recomputes it in policyholder ID-range shards
+    across a process pool, listing policyholders in ID order.
+    Supports conditional requests via `If-None-Match`.
     """
+    if mode == "vectorized" and not risk_vectorized.available:
+        raise HTTPException(status_code=400, detail="mode=vectorized requires NumPy, which is not installed.")
+    if not risk_window_is_current():
+        # Before the key and ETag are taken, so the refresh's risk_window bump applies to them.
+        await run_analytics(refresh_risk_window)
+    name = f"risk_analysis:{RISK_RULES_FINGERPRINT}"
+    not_modified = conditional(request, response, name, RISK_ANALYSIS_TABLES, mode)
+    if not_modified:
+        return not_modified
+    result = await cached_analytics(name, RISK_ANALYSIS_TABLES, compute_risk_analysis, mode)
+    if fastjson.enabled:
+        return fastjson.respond(result, response)
+    return result
+
+def compute_risk_analysis(mode="state"):
+    """Blocking body of /risk_analysis/; runs on the analytics executor."""
     conn = None
     cur = None
     try:
         conn = get_connection()
         cur = conn.cursor()
+        cur.arraysize = RISK_FETCH_ARRAYSIZE
 
-        now = datetime.now()
-        one_year_ago_target_date = (now - timedelta(days=365)).date()
+        if mode == "state":
+            return risk_state.load_report(cur)
 
-        cur.execute("SELECT id, name, sum_insured, policy_type FROM policyholders")
-        policyholders_data = cur.fetchall()
-        policyholder_map = {
-            ph_id: {"name": name, "sum_insured": si, "policy_type": pt}
-            for ph_id, name, si, pt in policyholders_data
-        }
+        if mode == "parallel":
+            executor = get_risk_process_executor()
+            try:
+                return risk_parallel.evaluate_risk(executor, cur, RISK_PARALLEL_SHARDS, RISK_FETCH_ARRAYSIZE)
+            except BrokenProcessPool:
+                print("Risk process pool broken; restarting it and retrying.")
+                replace_broken_risk_process_executor(executor)
+                return risk_parallel.evaluate_risk(
+                    get_risk_process_executor(), cur, RISK_PARALLEL_SHARDS, RISK_FETCH_ARRAYSIZE
+                )
 
-        cur.execute("SELECT id, policyholder_id, amount, status, date_of_claim FROM claims")
-        all_claims_rows = cur.fetchall()
-
-        global_approved_claims_by_policy_type = defaultdict(int)
-        for claim_row_tuple in all_claims_rows:
-            claim_status = claim_row_tuple[3]
-            if claim_status == 'Approved':
-                policyholder_id_for_claim = claim_row_tuple[1]
-                if policyholder_id_for_claim in policyholder_map:
-                    policy_type = policyholder_map[policyholder_id_for_claim]["policy_type"]
-                    global_approved_claims_by_policy_type[policy_type] += 1
-        
-        # total claims by policy type
-        total_claims_by_policy_type = defaultdict(int)
-        for claim_row_tuple in all_claims_rows:
-            policyholder_id_for_claim = claim_row_tuple[1] # policyholder_id
-            if policyholder_id_for_claim in policyholder_map:
-                policy_type = policyholder_map[policyholder_id_for_claim]["policy_type"]
-                total_claims_by_policy_type[policy_type] += 1
-
-        risk_report = []
-        high_risk_policyholders_details = []
-
-        for ph_id, ph_info in policyholder_map.items():
-            policyholder_all_claims_tuples = [
-                claim_row for claim_row in all_claims_rows if claim_row[1] == ph_id
-            ]
-
-            has_rejected_claim_over_80_percent = False
-            if ph_info["sum_insured"] and ph_info["sum_insured"] > 0:
-                for claim_tuple in policyholder_all_claims_tuples:
-                    claim_amount = claim_tuple[2]
-                    claim_status = claim_tuple[3]
-                    if claim_status == 'Rejected' and (claim_amount / ph_info["sum_insured"]) > 0.80:
-                        has_rejected_claim_over_80_percent = True
-                        break
-            
-            if has_rejected_claim_over_80_percent:
-                risk_report.append({
-                    'policyholder_id': ph_id, 'name': ph_info["name"],
-                    'risk_status_message': "Risk assessment skipped: Policyholder has a rejected claim exceeding 80% of sum insured.",
-                    'high_risk': False,
-                    'reason': "A rejected claim >80% of sum insured exists."
-                })
-                continue
+        policyholders_data = repository.risk_policyholders(cur)
 
-            ph_approved_claims_tuples = [
-                claim_tuple for claim_tuple in policyholder_all_claims_tuples if claim_tuple[3] == 'Approved'
-            ]
-
-            recent_approved_claims_count = 0
-            for app_claim_tuple in ph_approved_claims_tuples:
-                claim_date_val = app_claim_tuple[4]
-                current_claim_date_obj = None
-                if isinstance(claim_date_val, datetime): current_claim_date_obj = claim_date_val.date()
-                elif isinstance(claim_date_val, date): current_claim_date_obj = claim_date_val
-                
-                if current_claim_date_obj and current_claim_date_obj >= one_year_ago_target_date:
-                    recent_approved_claims_count += 1
-            
-            is_high_risk = False
-            risk_reasons = []
-
-            if recent_approved_claims_count > 3:
-                is_high_risk = True
-                risk_reasons.append(f"{recent_approved_claims_count} approved claims in the last year.")
-
-            if ph_info["sum_insured"] and ph_info["sum_insured"] > 0:
-                for app_claim_tuple in ph_approved_claims_tuples:
-                    app_claim_id = app_claim_tuple[0]
-                    app_claim_amount = app_claim_tuple[2]
-                    if (app_claim_amount / ph_info["sum_insured"]) > 0.80:
-                        is_high_risk = True
-                        risk_reasons.append(f"An approved claim (ID: {app_claim_id}, Amount: {app_claim_amount:.2f}) exceeds 80% of sum insured ({ph_info['sum_insured']:.2f}).")
-                        break
-
-            if is_high_risk:
-                risk_report.append({
-                    'policyholder_id': ph_id, 'name': ph_info["name"],
-                    'risk_status_message': "High Risk", 'high_risk': True,
-                    'reason': "; ".join(risk_reasons) if risk_reasons else "High risk conditions met."
-                })
-                high_risk_policyholders_details.append({
-                    'policyholder_id': ph_id, 'name': ph_info["name"],
-                    'reason_for_high_risk': "; ".join(risk_reasons) if risk_reasons else "High risk conditions met.",
-                    'recent_accepted_claims_count': recent_approved_claims_count
-                })
-            else:
-                risk_report.append({
-                    'policyholder_id': ph_id, 'name': ph_info["name"],
-                    'risk_status_message': "Standard Risk", 'high_risk': False,
-                    'reason': "No high-risk conditions met based on approved claims."
-                })
+        if mode == "vectorized":
+            return risk_vectorized.evaluate_risk(policyholders_data, risk_vectorized.load_claim_columns(cur))
 
-        return {
-            "risk_analysis_report": risk_report,
-            "high_risk_summary": high_risk_policyholders_details,
-            "claims_by_policy_type_approved": dict(global_approved_claims_by_policy_type),
-            "total_claims_by_policy_type": dict(total_claims_by_policy_type) # ADDED THIS LINE
-        }
+        # Claims are consumed straight off the cursor in a single pass; only per-policyholder
+        # accumulators are kept in memory.
+        return risk.evaluate_risk(policyholders_data, repository.risk_claims(cur))
 
-    except oracledb.DatabaseError as e_db:
-        error_obj, = e_db.args
-        detail_message = f"Database error during risk analysis (Code: {error_obj.code}): {error_obj.message}"
-        print(f"Oracle Error in risk analysis: {detail_message}")
+    except risk_state.RulesMismatch as e_rules:
+        raise HTTPException(status_code=409, detail=f"{e_rules} Or use mode=full.")
+    except storage.DatabaseError as e_db:
+        code, message = storage.error_info(e_db)
+        detail_message = f"Database error during risk analysis (Code: {code}): {message}"
+        print(f"Database Error in risk analysis: {detail_message}")
         raise HTTPException(status_code=500, detail=detail_message)
     except Exception as e_general:
         error_type_name = type(e_general).__name__
@@ -325,71 +784,284 @@ async def risk_analysis_endpoint():
         if cur: cur.close()
         if conn: conn.close()
 
-@app.get("/reports/", tags=["Analysis & Reports"])
-def reports_endpoint():
-    """Generates various reports based on claims and policyholder data."""
+def evaluate_policyholders(policyholder_ids):
+    """
+    Runs the risk rules for just these policyholders with indexed point queries. Returns
+    {policyholder_id: risk_analysis_report entry} for the ones that exist.
+    """
     conn = None
     cur = None
     try:
         conn = get_connection()
         cur = conn.cursor()
-        
-        cur.execute("""
-            SELECT TO_CHAR(date_of_claim, 'YYYY-MM') AS claim_month, COUNT(*) AS claim_count
-            FROM claims
-            GROUP BY TO_CHAR(date_of_claim, 'YYYY-MM')
-            ORDER BY claim_month
-        """)
-        claims_per_month = {row[0]: row[1] for row in cur.fetchall()}
-        
-        cur.execute("""
-            SELECT p.policy_type, NVL(AVG(c.amount), 0) AS avg_amount
-            FROM policyholders p
-            LEFT JOIN claims c ON c.policyholder_id = p.id AND c.status = 'Approved'
-            GROUP BY p.policy_type
-        """)
-        avg_claim_by_type = {row[0]: round(float(row[1]), 2) for row in cur.fetchall()}
-        
-        cur.execute("""
-            SELECT id, amount, policyholder_id
-            FROM claims
-            ORDER BY amount DESC
-            FETCH FIRST 1 ROWS ONLY
-        """)
-        row = cur.fetchone()
-        highest_claim_info = {'id': row[0], 'amount': float(row[1]), 'policyholder_id': row[2]} if row else None
-        
-        cur.execute("SELECT DISTINCT policyholder_id FROM claims WHERE status = 'Pending'")
-        pending_ph_ids_tuples = cur.fetchall()
-        pending_ph_ids = [item[0] for item in pending_ph_ids_tuples]
-
-        pending_names = []
-        if pending_ph_ids:
-            bind_names = [f":id{i+1}" for i in range(len(pending_ph_ids))]
-            bind_values = {f"id{i+1}": ph_id for i, ph_id in enumerate(pending_ph_ids)}
-            if bind_names:
-                query = f"SELECT name FROM policyholders WHERE id IN ({','.join(bind_names)})"
-                cur.execute(query, bind_values)
-                pending_names = [r[0] for r in cur.fetchall()]
-            
-        return {
-            'claims_per_month': claims_per_month,
-            'avg_claim_by_type': avg_claim_by_type,
-            'highest_claim': highest_claim_info,
-            'policyholders_with_pending_claims': pending_names
+        policyholders_data = repository.risk_policyholders_by_ids(cur, policyholder_ids)
+        if not policyholders_data:
+            return {}
+        report = risk.evaluate_risk(
+            policyholders_data, repository.risk_claims_by_policyholders(cur, [row[0] for row in policyholders_data])
+        )
+        return {entry['policyholder_id']: entry for entry in report['risk_analysis_report']}
+    except storage.DatabaseError as e_db:
+        code, message = storage.error_info(e_db)
+        detail_message = f"Database error during risk lookup (Code: {code}): {message}"
+        print(f"Database Error in risk lookup: {detail_message}")
+        raise HTTPException(status_code=500, detail=detail_message)
+    except Exception as e_general:
+        error_type_name = type(e_general).__name__
+        print(f"General Error in risk lookup ({error_type_name}): {str(e_general)}")
+        raise HTTPException(status_code=500, detail=f"An unexpected error in risk lookup: {error_type_name}.")
+    finally:
+        if cur: cur.close()
+        if conn: conn.close()
+
+@app.get("/risk_analysis/{policyholder_id}", tags=["Analysis & Reports"])
+def risk_lookup(policyholder_id: int, request: Request, response: Response):
+    """
+    Risk status of a single policyholder, using the same rules as /risk_analysis/ but reading
+    only that policyholder's claims. Supports conditional requests via `If-None-Match`.
+    """
+    not_modified = conditional(
+        request, response, f"risk_lookup:{RISK_RULES_FINGERPRINT}", RISK_ANALYSIS_TABLES, policyholder_id
+    )
+    if not_modified:
+        return not_modified
+    entry = evaluate_policyholders([policyholder_id]).get(policyholder_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Policyholder with ID {policyholder_id} not found.")
+    return entry
+
+@app.post("/risk_analysis/batch", tags=["Analysis & Reports"])
+def risk_lookup_batch(batch: RiskBatchIn):
+    """
+    Risk status of up to 1000 policyholders in request order; unknown IDs are listed
+    under `not_found`.
+    """
+    policyholder_ids = list(dict.fromkeys(batch.policyholder_ids))
+    entries = evaluate_policyholders(policyholder_ids)
+    return {
+        "risk_analysis_report": [entries[ph_id] for ph_id in policyholder_ids if ph_id in entries],
+        "not_found": [ph_id for ph_id in policyholder_ids if ph_id not in entries]
+    }
+
+@app.get("/risk_rules", tags=["Analysis & Reports"])
+def get_risk_rules():
+    """The active risk rule thresholds: defaults plus per-policy-type overrides."""
+    return {**risk_rules.active.to_dict(), "fingerprint": RISK_RULES_FINGERPRINT}
+
+@app.get("/reports/", tags=["Analysis & Reports"])
+async def reports_endpoint(
+    request: Request,
+    response: Response,
+    from_month: Optional[str] = Query(None, description="First month to include (YYYY-MM)"),
+    to_month: Optional[str] = Query(None, description="Last month to include (YYYY-MM)")
+):
+    """
+    Generates various reports based on claims and policyholder data, optionally limited to
+    an inclusive month range. Supports conditional requests via `If-None-Match`.
+    """
+    try:
+        reports.month_range(from_month, to_month)
+    except ValueError as e_range:
+        raise HTTPException(status_code=400, detail=f"Invalid month range: {e_range}")
+    not_modified = conditional(request, response, "reports", REPORTS_TABLES, from_month, to_month)
+    if not_modified:
+        return not_modified
+    return await cached_analytics("reports", REPORTS_TABLES, compute_reports, from_month, to_month)
+
+def run_report_query(query, period):
+    """Runs one report query on its own pooled connection."""
+    conn = get_connection()
+    cur = None
+    try:
+        cur = conn.cursor()
+        return query(cur, period)
+    finally:
+        if cur: cur.close()
+        conn.close()
+
+def compute_reports(from_month=None, to_month=None):
+    """Blocking body of /reports/; runs on the analytics executor and fans the queries out."""
+    try:
+        period = reports.month_range(from_month, to_month)
+        futures = {
+            name: report_query_executor.submit(contextvars.copy_context().run, run_report_query, query, period)
+            for name, query in reports.REPORT_QUERIES.items()
         }
-    except oracledb.DatabaseError as e_db:
-        error_obj, = e_db.args
-        detail_message = f"Database error during report generation (Code: {error_obj.code}): {error_obj.message}"
-        print(f"Oracle Error in reports: {detail_message}")
+        return {name: future.result() for name, future in futures.items()}
+    except storage.DatabaseError as e_db:
+        code, message = storage.error_info(e_db)
+        detail_message = f"Database error during report generation (Code: {code}): {message}"
+        print(f"Database Error in reports: {detail_message}")
         raise HTTPException(status_code=500, detail=detail_message)
+    except HTTPException:
+        raise
     except Exception as e_general:
         error_type_name = type(e_general).__name__
         error_message = str(e_general)
         print(f"General Error in reports ({error_type_name}): {error_message}")
         raise HTTPException(status_code=500, detail=f"An unexpected error during report generation: {error_type_name}.")
+
+# --- Background Jobs ---
+# What each job kind computes: (cache name, tables, blocking function). A finished job also
+# fills the response cache, and its snapshot is stale once one of the tables has been written.
+JOB_KINDS = {
+    "risk_analysis": (f"risk_analysis:{RISK_RULES_FINGERPRINT}", RISK_ANALYSIS_TABLES, compute_risk_analysis),
+    "reports": ("reports", REPORTS_TABLES, compute_reports),
+}
+
+# Jobs queued or running in this process; close_pool() marks them failed.
+_jobs_lock = threading.Lock()
+_jobs_in_process = set()
+
+def submit_job(response, kind, *params):
+    """Queues kind(*params) unless the same job is already queued or running; returns the job."""
+    if not _job_slots.acquire(blocking=False):
+        raise HTTPException(status_code=503, detail="Too many analytics jobs queued; retry later.")
+    try:
+        job, created = job_store.create(kind, params)
+        if created:
+            with _jobs_lock:
+                _jobs_in_process.add(job["id"])
+            job_executor.submit(run_job, job["id"], kind, params)
+    except Exception:
+        _job_slots.release()
+        raise
+    if not created:
+        _job_slots.release()
+    response.headers["Location"] = f"/jobs/{job['id']}"
+    return job
+
+def run_job(job_id, kind, params):
+    """Job body; runs on the job executor."""
+    name, tables, func = JOB_KINDS[kind]
+    try:
+        if kind == "risk_analysis":
+            refresh_risk_window()
+        # Like cached_analytics, the key is taken before computing.
+        source = response_cache.key(name, tables, *params)
+        job_store.start(job_id, source)
+        result = func(*params)
+        job_store.succeed(job_id, result)
+        response_cache.set(source, result)
+    except HTTPException as e_http:
+        job_store.fail(job_id, e_http.detail)
+    except Exception as e_general:
+        print(f"General Error in {kind} job {job_id} ({type(e_general).__name__}): {str(e_general)}")
+        job_store.fail(job_id, f"An unexpected error in the {kind} job: {type(e_general).__name__}.")
     finally:
-        if cur: cur.close()
-        if conn: conn.close()
+        with _jobs_lock:
+            _jobs_in_process.discard(job_id)
+        _job_slots.release()
+
+def snapshot_body(kind, params, snapshot):
+    name, tables, _ = JOB_KINDS[kind]
+    return {
+        "kind": kind,
+        "params": list(params),
+        "version": snapshot["version"],
+        "job_id": snapshot["job_id"],
+        "computed_at": datetime.fromtimestamp(snapshot["computed_at"]).isoformat(timespec="seconds"),
+        # Data written since the snapshot was computed; submit a new job to refresh it.
+        "stale": response_cache.key(name, tables, *params) != snapshot["source"],
+        "result": snapshot["result"]
+    }
+
+def serve_latest_snapshot(request, response, kind, *params):
+    snapshot = job_store.snapshot(kind, params)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail=f"No {kind} snapshot yet; submit POST /jobs/{kind}.")
+    body = snapshot_body(kind, params, snapshot)
+    etag = f'"{snapshot["job_id"]}-{int(body["stale"])}"'
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return body
+
+@app.post("/jobs/risk_analysis", status_code=202, tags=["Jobs"])
+def start_risk_analysis_job(
+    response: Response, mode: Literal["state", "full", "vectorized", "parallel"] = "state"
+):
+    """
+    Queues a /risk_analysis/ computation and returns its job at once; poll GET /jobs/{job_id}.
+    An identical job that is already queued or running is returned instead of a new one.
+    """
+    if mode == "vectorized" and not risk_vectorized.available:
+        raise HTTPException(status_code=400, detail="mode=vectorized requires NumPy, which is not installed.")
+    return submit_job(response, "risk_analysis", mode)
+
+@app.post("/jobs/reports", status_code=202, tags=["Jobs"])
+def start_reports_job(
+    response: Response,
+    from_month: Optional[str] = Query(None, description="First month to include (YYYY-MM)"),
+    to_month: Optional[str] = Query(None, description="Last month to include (YYYY-MM)")
+):
+    """Queues a /reports/ computation and returns its job at once; poll GET /jobs/{job_id}."""
+    try:
+        reports.month_range(from_month, to_month)
+    except ValueError as e_range:
+        raise HTTPException(status_code=400, detail=f"Invalid month range: {e_range}")
+    return submit_job(response, "reports", from_month, to_month)
+
+@app.get("/jobs/risk_analysis/latest", tags=["Jobs"])
+def latest_risk_analysis_snapshot(
+    request: Request, response: Response, mode: Literal["state", "full", "vectorized", "parallel"] = "state"
+):
+    """The most recent finished risk analysis snapshot for `mode`; 404 until a job has finished."""
+    return serve_latest_snapshot(request, response, "risk_analysis", mode)
+
+@app.get("/jobs/reports/latest", tags=["Jobs"])
+def latest_reports_snapshot(
+    request: Request,
+    response: Response,
+    from_month: Optional[str] = Query(None, description="First month to include (YYYY-MM)"),
+    to_month: Optional[str] = Query(None, description="Last month to include (YYYY-MM)")
+):
+    """The most recent finished reports snapshot for the month range; 404 until a job has finished."""
+    return serve_latest_snapshot(request, response, "reports", from_month, to_month)
+
+@app.get("/jobs/{job_id}", tags=["Jobs"])
+def get_job(job_id: str):
+    """
+    Status of a job (queued, running, succeeded or failed). A succeeded job includes the
+    snapshot it produced, while that version is still retained.
+    """
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job with ID {job_id} not found.")
+    if job["snapshot_version"] is not None:
+        snapshot = job_store.snapshot(job["kind"], job["params"], job["snapshot_version"])
+        if snapshot is not None:
+            job["snapshot"] = snapshot_body(job["kind"], job["params"], snapshot)
+    return job
+
+@app.get("/metrics", response_class=PlainTextResponse, tags=["Monitoring"])
+def metrics_endpoint():
+    """Request latency, in-flight requests and DB acquire/execute/fetch timings in Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/admin/slow_query_log", tags=["Monitoring"])
+def get_slow_query_log():
+    """Current slow-query log settings and the most recent slow statements (newest last)."""
+    return {"settings": dict(slowlog.settings), "recent": list(slowlog.recent)}
+
+@app.put("/admin/slow_query_log", tags=["Monitoring"])
+def update_slow_query_log(update: SlowQueryLogSettings):
+    """Switches the slow-query log, its threshold or EXPLAIN capture at runtime."""
+    return {"settings": slowlog.configure(**update.dict())}
+
+@app.get("/pool/stats", tags=["Monitoring"])
+def pool_stats():
+    """Reports connection pool usage so it can be sized (min/max/increment, busy/open, acquire wait times)."""
+    with _pool_lock:
+        wait_stats = dict(_pool_wait_stats)
+    acquired = wait_stats["acquired"]
+    return {
+        "backend": backend.name,
+        **backend.stats(),
+        "acquired": acquired,
+        "acquire_failures": wait_stats["failures"],
+        "avg_wait_ms": round(wait_stats["total_wait_ms"] / acquired, 3) if acquired else 0.0,
+        "max_wait_ms": round(wait_stats["max_wait_ms"], 3)
+    }
 
 # To run: uvicorn api:app --reload
\ No newline at end of file
@@ -1,6 +1,7 @@
 import streamlit as st
 from datetime import datetime, timedelta, date 
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+import threading
 import requests
 
 
@@ -102,6 +103,7 @@ st.markdown('''
 
 # --- API Endpoints ---
 API_URL = "http://localhost:8000"  
+CLIENT_CACHE_TTL_SECONDS = 30  # API responses are reused across reruns for this long (writes clear them)
 
 # --- Data Models ---
 class PolicyholderRep: 
@@ -174,12 +176,102 @@ def validate_claim(policyholder_id_to_check, amount, reason, status, date_of_cla
         return False
     return True
 
+# --- HTTP Session ---
+@st.cache_resource
+def get_session():
+    """One keep-alive session shared by every rerun and user of this Streamlit server."""
+    return requests.Session()
+
+# --- Conditional GET ---
+# The last body and ETag of every GET are kept server-side; repeat requests send
+# If-None-Match and reuse the stored body when the API answers 304 Not Modified. Only the
+# most recently used responses are kept, since every page cursor is a key of its own.
+ETAG_STORE_MAX_ENTRIES = 256
+
+@st.cache_resource
+def get_etag_store():
+    """(OrderedDict of stored responses, least recently used first; the lock guarding it)."""
+    return OrderedDict(), threading.Lock()
+
+def get_json(path, params=None):
+    """Returns (body, headers) for an API GET, revalidating the stored copy if there is one."""
+    etag_store, etag_store_lock = get_etag_store()
+    key = (path, tuple(sorted((params or {}).items())))
+    with etag_store_lock:
+        stored = etag_store.get(key)
+        if stored:
+            etag_store.move_to_end(key)
+    request_headers = {"If-None-Match": stored["etag"]} if stored else {}
+    response = get_session().get(f"{API_URL}/{path}", params=params, headers=request_headers)
+    if response.status_code == 304 and stored:
+        return stored["body"], stored["headers"]
+    response.raise_for_status()
+    body = response.json()
+    headers = requests.structures.CaseInsensitiveDict(response.headers)
+    if headers.get("ETag"):
+        with etag_store_lock:
+            etag_store[key] = {"etag": headers["ETag"], "body": body, "headers": headers}
+            etag_store.move_to_end(key)
+            while len(etag_store) > ETAG_STORE_MAX_ENTRIES:
+                etag_store.popitem(last=False)
+    return body, headers
+
 # --- Fetch initial data ---
+# List endpoints are keyset-paginated: the next page position comes back in a response header
+# and is sent again as the query parameter below.
+PAGE_SIZE = 1000
+PAGE_CURSOR_PARAMS = {"policyholders": "after_id", "claims": "cursor"}
+
+# Cached loaders: identical calls within a run, and across reruns until the TTL passes or
+# a write calls invalidate_cache(), are answered without contacting the API. Errors are
+# raised rather than cached.
+@st.cache_data(ttl=CLIENT_CACHE_TTL_SECONDS, show_spinner=False)
+def load_list(endpoint):
+    items = []
+    params = {"limit": PAGE_SIZE}
+    while True:
+        page, headers = get_json(f"{endpoint}/", params)
+        items.extend(page)
+        next_cursor = headers.get("X-Next-Cursor")
+        if not next_cursor:
+            return items
+        params = {"limit": PAGE_SIZE, PAGE_CURSOR_PARAMS[endpoint]: next_cursor}
+
+@st.cache_data(ttl=CLIENT_CACHE_TTL_SECONDS, show_spinner=False)
+def load_json(path):
+    body, _ = get_json(path)
+    return body
+
+def invalidate_cache():
+    """Drops cached API responses after a write so the next render shows it."""
+    load_list.clear()
+    load_json.clear()
+
+# --- Analytics Snapshots ---
+# Risk analysis and reports run as background jobs on the API; their tabs show the latest
+# finished snapshot and only request a new one when there is none or the data has changed.
+def load_snapshot(kind):
+    """Latest snapshot of an analytics job, or None while the first one is still running."""
+    try:
+        snapshot, _ = get_json(f"jobs/{kind}/latest")
+    except requests.exceptions.HTTPError as e:
+        if e.response is None or e.response.status_code != 404:
+            raise
+        snapshot = None
+    if snapshot is None or snapshot["stale"]:
+        # Repeat requests join the job already queued or running; 503 means the queue is full.
+        response = get_session().post(f"{API_URL}/jobs/{kind}")
+        if response.status_code != 503:
+            response.raise_for_status()
+    return snapshot
+
+def show_snapshot_status(snapshot):
+    note = " (new data since; updating in the background)" if snapshot["stale"] else ""
+    st.caption(f"As of {snapshot['computed_at']}{note}")
+
 def fetch_data(endpoint):
     try:
-        response = requests.get(f"{API_URL}/{endpoint}/")
-        response.raise_for_status()
-        return response.json()
+        return load_list(endpoint)
     except requests.exceptions.RequestException as e:
         st.error(f"API Error fetching {endpoint}: {e}")
         return []
@@ -188,7 +280,6 @@ def fetch_data(endpoint):
         return []
 
 policyholders_global = fetch_data("policyholders")
-claims_global = fetch_data("claims")
 
 st.markdown("<div class='main'>", unsafe_allow_html=True)
 st.title("💰 ABC Insurance: Claims & Risk Portal")
@@ -197,22 +288,29 @@ tabs = st.tabs(["Dashboard", "Policyholders", "Claims", "Risk Analysis", "Report
 # --- Dashboard ---
 with tabs[0]:
     st.markdown("<h2 style='text-align:center; font-family:Poppins,sans-serif;'>Dashboard Overview</h2>", unsafe_allow_html=True)
-    pending_count = sum(1 for c in claims_global if c.get('status') == 'Pending')
-    approved_count = sum(1 for c in claims_global if c.get('status') == 'Approved')
-    rejected_count = sum(1 for c in claims_global if c.get('status') == 'Rejected')
+    try:
+        summary = load_json("dashboard/summary")
+    except requests.exceptions.RequestException as e:
+        st.error(f"API Error: Could not fetch dashboard summary. {e}")
+        summary = {}
+    policyholder_count = summary.get('policyholders', 0)
+    claim_count = summary.get('claims', 0)
+    pending_count = summary.get('pending', 0)
+    approved_count = summary.get('approved', 0)
+    rejected_count = summary.get('rejected', 0)
 
     col1, col2, col3, col4, col5 = st.columns(5)
     with col1:
         st.markdown(f"""
         <div class='metric-card'>
             <div class='fa-icon'><i class='fa-solid fa-users'></i></div>
-            <h4>Policyholders</h4><h2>{len(policyholders_global)}</h2>
+            <h4>Policyholders</h4><h2>{policyholder_count}</h2>
         </div>""", unsafe_allow_html=True)
     with col2:
         st.markdown(f"""
         <div class='metric-card'>
             <div class='fa-icon'><i class='fa-solid fa-file-invoice-dollar'></i></div>
-            <h4>Claims</h4><h2>{len(claims_global)}</h2>
+            <h4>Claims</h4><h2>{claim_count}</h2>
         </div>""", unsafe_allow_html=True)
     with col3:
         st.markdown(f"""
@@ -257,10 +355,10 @@ with tabs[1]:
                     ph_data = {
                         "name": name, "age": age, "policy_type": policy_type, "sum_insured": sum_insured
                     }
-                    response = requests.post(f"{API_URL}/policyholders/", json=ph_data)
+                    response = get_session().post(f"{API_URL}/policyholders/", json=ph_data)
                     if response.status_code == 201:
                         st.success(f"✅ Policyholder '{name}' registered successfully!")
-                        policyholders_global = fetch_data("policyholders") # Refresh global list
+                        invalidate_cache()
                         st.rerun() # Rerun to update the UI, especially the table
                     else:
                         st.error(f"❌ Error registering policyholder: {response.text} (Status: {response.status_code})")
@@ -284,7 +382,7 @@ with tabs[1]:
 with tabs[2]:
     st.markdown("<h2>Claim Management</h2>", unsafe_allow_html=True)
     
-    policyholders_for_claim_form = fetch_data("policyholders")
+    policyholders_for_claim_form = policyholders_global
 
     if not policyholders_for_claim_form:
         st.warning("No policyholders available to file a claim. Please register a policyholder first.")
@@ -320,10 +418,10 @@ with tabs[2]:
                             "status": status,
                             "date_of_claim": date_of_claim_input.isoformat() 
                         }
-                        response = requests.post(f"{API_URL}/claims/", json=claim_data)
+                        response = get_session().post(f"{API_URL}/claims/", json=claim_data)
                         if response.status_code == 201:
                             st.success(f"✅ Claim added successfully for policyholder ID {selected_policyholder_id}!")
-                            claims_global = fetch_data("claims") # Refresh global claims
+                            invalidate_cache()
                             st.rerun() # Rerun to update UI
                         else:
                             st.error(f"❌ Error adding claim: {response.text} (Status: {response.status_code})")
@@ -333,7 +431,7 @@ with tabs[2]:
                     st.error(f"API connection error: {e}")
     
     st.markdown("<h4>All Claims</h4>", unsafe_allow_html=True)
-    claims_to_display = fetch_data("claims") 
+    claims_to_display = fetch_data("claims")
     if claims_to_display:
         ph_names_map = {ph['id']: ph['name'] for ph in policyholders_global}
         
@@ -356,64 +454,67 @@ with tabs[2]:
 with tabs[3]:
     st.markdown("<h2>Risk Analysis</h2>", unsafe_allow_html=True)
     try:
-        response = requests.get(f"{API_URL}/risk_analysis/")
-        response.raise_for_status()
-        analysis_data = response.json()
-
-        risk_report_df_data = []
-        if "risk_analysis_report" in analysis_data:
-            for report_item in analysis_data["risk_analysis_report"]:
-                risk_report_df_data.append({
-                    "Policyholder ID": report_item.get("policyholder_id", "N/A"),
-                    "Name": report_item.get("name", "N/A"),
-                    "Risk Status": report_item.get("risk_status_message", "Error processing"),
-                    "Is High Risk": "Yes" if report_item.get("high_risk") else "No",
-                    "Reason/Details": report_item.get("reason", "N/A")
-                })
-        
-        if risk_report_df_data:
-            st.markdown("<h4>Policyholder Risk Assessment</h4>", unsafe_allow_html=True)
-            st.dataframe(risk_report_df_data, use_container_width=True)
+        snapshot = load_snapshot("risk_analysis")
+        if snapshot is None:
+            st.info("Risk analysis is being computed in the background; refresh the page in a moment.")
         else:
-            st.info("No risk analysis data available or could not be processed.")
-
-        # Corrected section for Approved Claims by Policy Type
-        st.markdown("<h4>Approved Claims by Policy Type (Overall)</h4>", unsafe_allow_html=True)
-        if "claims_by_policy_type_approved" in analysis_data and analysis_data["claims_by_policy_type_approved"]: 
-            approved_claims_by_type = analysis_data["claims_by_policy_type_approved"] 
-            if approved_claims_by_type:
-                 st.bar_chart(approved_claims_by_type)
+            show_snapshot_status(snapshot)
+            analysis_data = snapshot["result"]
+
+            risk_report_df_data = []
+            if "risk_analysis_report" in analysis_data:
+                for report_item in analysis_data["risk_analysis_report"]:
+                    risk_report_df_data.append({
+                        "Policyholder ID": report_item.get("policyholder_id", "N/A"),
+                        "Name": report_item.get("name", "N/A"),
+                        "Risk Status": report_item.get("risk_status_message", "Error processing"),
+                        "Is High Risk": "Yes" if report_item.get("high_risk") else "No",
+                        "Reason/Details": report_item.get("reason", "N/A")
+                    })
+        
+            if risk_report_df_data:
+                st.markdown("<h4>Policyholder Risk Assessment</h4>", unsafe_allow_html=True)
+                st.dataframe(risk_report_df_data, use_container_width=True)
             else:
-                 st.info("No approved claims data to display by policy type.")
-        else:
-            # MODIFIED TEXT
-            st.info("Data for 'Approved Claims by Policy Type' not found in API response or no approved claims.")
-
-        # NEW: Section for Total Claims by Policy Type
-        st.markdown("<h4>Total Claims by Policy Type (Overall)</h4>", unsafe_allow_html=True)
-        if "total_claims_by_policy_type" in analysis_data and analysis_data["total_claims_by_policy_type"]:
-            all_claims_by_type_data = analysis_data["total_claims_by_policy_type"]
-            if all_claims_by_type_data: # Check if dictionary is not empty
-                 st.bar_chart(all_claims_by_type_data)
+                st.info("No risk analysis data available or could not be processed.")
+
+            # Corrected section for Approved Claims by Policy Type
+            st.markdown("<h4>Approved Claims by Policy Type (Overall)</h4>", unsafe_allow_html=True)
+            if "claims_by_policy_type_approved" in analysis_data and analysis_data["claims_by_policy_type_approved"]: 
+                approved_claims_by_type = analysis_data["claims_by_policy_type_approved"] 
+                if approved_claims_by_type:
+                     st.bar_chart(approved_claims_by_type)
+                else:
+                     st.info("No approved claims data to display by policy type.")
             else:
-                 st.info("No claims data to display by policy type (overall).")
-        else:
-            st.info("Data for 'Total Claims by Policy Type' not found in API response or no claims exist.")
-            
-        if "high_risk_summary" in analysis_data and analysis_data["high_risk_summary"]:
-            st.markdown("<h4>Summary of High-Risk Policyholders</h4>", unsafe_allow_html=True)
-            high_risk_summary_df_data = [
-                {
-                    "Policyholder ID": hr_item.get("policyholder_id"),
-                    "Name": hr_item.get("name"),
-                    "Reason for High Risk": hr_item.get("reason_for_high_risk"),
-                    "Recent Accepted Claims": hr_item.get("recent_accepted_claims_count", "N/A") 
-                } for hr_item in analysis_data["high_risk_summary"]
-            ]
-            if high_risk_summary_df_data:
-                st.table(high_risk_summary_df_data)
+                # MODIFIED TEXT
+                st.info("Data for 'Approved Claims by Policy Type' not found in API response or no approved claims.")
+
+            # NEW: Section for Total Claims by Policy Type
+            st.markdown("<h4>Total Claims by Policy Type (Overall)</h4>", unsafe_allow_html=True)
+            if "total_claims_by_policy_type" in analysis_data and analysis_data["total_claims_by_policy_type"]:
+                all_claims_by_type_data = analysis_data["total_claims_by_policy_type"]
+                if all_claims_by_type_data: # Check if dictionary is not empty
+                     st.bar_chart(all_claims_by_type_data)
+                else:
+                     st.info("No claims data to display by policy type (overall).")
             else:
-                st.info("No policyholders currently flagged as high risk based on the criteria.")
+                st.info("Data for 'Total Claims by Policy Type' not found in API response or no claims exist.")
+            
+            if "high_risk_summary" in analysis_data and analysis_data["high_risk_summary"]:
+                st.markdown("<h4>Summary of High-Risk Policyholders</h4>", unsafe_allow_html=True)
+                high_risk_summary_df_data = [
+                    {
+                        "Policyholder ID": hr_item.get("policyholder_id"),
+                        "Name": hr_item.get("name"),
+                        "Reason for High Risk": hr_item.get("reason_for_high_risk"),
+                        "Recent Accepted Claims": hr_item.get("recent_accepted_claims_count", "N/A") 
+                    } for hr_item in analysis_data["high_risk_summary"]
+                ]
+                if high_risk_summary_df_data:
+                    st.table(high_risk_summary_df_data)
+                else:
+                    st.info("No policyholders currently flagged as high risk based on the criteria.")
 
     except requests.exceptions.RequestException as e:
         st.error(f"API Error: Could not fetch risk analysis data. {e}")
@@ -425,40 +526,43 @@ with tabs[3]:
 with tabs[4]:
     st.markdown("<h2>Reports</h2>", unsafe_allow_html=True)
     try:
-        response = requests.get(f"{API_URL}/reports/")
-        response.raise_for_status()
-        reports_data = response.json()
+        snapshot = load_snapshot("reports")
+        if snapshot is None:
+            st.info("Reports are being computed in the background; refresh the page in a moment.")
+        else:
+            show_snapshot_status(snapshot)
+            reports_data = snapshot["result"]
 
-        policyholders_rep_list = fetch_data("policyholders") 
-        ph_names_map_reports = {ph['id']: ph['name'] for ph in policyholders_rep_list}
+            policyholders_rep_list = policyholders_global
+            ph_names_map_reports = {ph['id']: ph['name'] for ph in policyholders_rep_list}
 
-        st.markdown("<h4>Total Claims Per Month</h4>", unsafe_allow_html=True)
-        if reports_data.get("claims_per_month") and reports_data["claims_per_month"]:
-            st.bar_chart(reports_data["claims_per_month"])
-        else:
-            st.info("No monthly claim data to report.")
+            st.markdown("<h4>Total Claims Per Month</h4>", unsafe_allow_html=True)
+            if reports_data.get("claims_per_month") and reports_data["claims_per_month"]:
+                st.bar_chart(reports_data["claims_per_month"])
+            else:
+                st.info("No monthly claim data to report.")
 
-        st.markdown("<h4>Average Accepted Claim Amount by Policy Type</h4>", unsafe_allow_html=True)
-        if reports_data.get("avg_claim_by_type") and reports_data["avg_claim_by_type"]:
-            st.bar_chart(reports_data["avg_claim_by_type"]) # This correctly shows average for 'Approved' claims as per API
-        else:
-            st.info("No average claim amount data to report by policy type.")
-
-        st.markdown("<h4>Highest Claim Filed</h4>", unsafe_allow_html=True)
-        highest_claim_info = reports_data.get("highest_claim")
-        if highest_claim_info:
-            st.write(f"**ID:** {highest_claim_info.get('id')}")
-            st.write(f"**Amount:** ₹ {highest_claim_info.get('amount'):,.2f}")
-            st.write(f"**Policyholder:** {ph_names_map_reports.get(highest_claim_info.get('policyholder_id'), 'Unknown')}")
-        else:
-            st.info("No claims filed yet to determine the highest.")
+            st.markdown("<h4>Average Accepted Claim Amount by Policy Type</h4>", unsafe_allow_html=True)
+            if reports_data.get("avg_claim_by_type") and reports_data["avg_claim_by_type"]:
+                st.bar_chart(reports_data["avg_claim_by_type"]) # This correctly shows average for 'Approved' claims as per API
+            else:
+                st.info("No average claim amount data to report by policy type.")
+
+            st.markdown("<h4>Highest Claim Filed</h4>", unsafe_allow_html=True)
+            highest_claim_info = reports_data.get("highest_claim")
+            if highest_claim_info:
+                st.write(f"**ID:** {highest_claim_info.get('id')}")
+                st.write(f"**Amount:** ₹ {highest_claim_info.get('amount'):,.2f}")
+                st.write(f"**Policyholder:** {ph_names_map_reports.get(highest_claim_info.get('policyholder_id'), 'Unknown')}")
+            else:
+                st.info("No claims filed yet to determine the highest.")
 
-        st.markdown("<h4>Policyholders with Pending Claims</h4>", unsafe_allow_html=True)
-        pending_names = reports_data.get("policyholders_with_pending_claims")
-        if pending_names:
-            st.write(", ".join(pending_names))
-        else:
-            st.info("No policyholders currently have pending claims.")
+            st.markdown("<h4>Policyholders with Pending Claims</h4>", unsafe_allow_html=True)
+            pending_names = reports_data.get("policyholders_with_pending_claims")
+            if pending_names:
+                st.write(", ".join(pending_names))
+            else:
+                st.info("No policyholders currently have pending claims.")
 
     except requests.exceptions.RequestException as e:
         st.error(f"API Error: Could not fetch report data. {e}")
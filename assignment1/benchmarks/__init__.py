@@ -0,0 +1,21 @@
+"""
+Reproducible benchmarks for the claims API.
+
+    python -m benchmarks.generate --scale 100k --seed 42 --reset
+    python -m benchmarks.harness --iterations 50
+    python -m benchmarks.serialization --rows 1000
+
+`generate` fills policyholders and claims with seeded synthetic data; `harness` times the
+endpoint functions in-process and writes p50/p95/p99 latency and throughput to
+benchmarks/results/ so runs can be compared (`--compare <previous result file>`).
+`serialization` compares the default and fastjson encodings of the large responses.
+Run them from the assignment1 directory.
+
+Unless STORAGE_BACKEND is set, benchmarks run against an embedded SQLite file
+(SQLITE_PATH, default benchmarks/bench.db) so they need no database server or network;
+set STORAGE_BACKEND=oracle to measure against the configured Oracle instance instead.
+"""
+import os
+
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", os.path.join(os.path.dirname(__file__), "bench.db"))
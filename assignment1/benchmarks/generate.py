@@ -0,0 +1,149 @@
+# benchmarks/generate.py
+"""
+Seeded synthetic data generator.
+
+Scales are named by claim count; policyholders are a tenth of that. Statuses, policy types,
+claim dates (skewed towards recent months) and amounts (mostly small fractions of the sum
+insured, with a tail above 80%) follow fixed distributions, so the same seed always produces
+the same data set.
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+import database
+import migrations
+import risk_state
+import rollup
+
+SCALES = {
+    "1k": 1_000,
+    "100k": 100_000,
+    "10m": 10_000_000,
+}
+CLAIMS_PER_POLICYHOLDER = 10
+
+POLICY_TYPES = ["Health", "Vehicle", "Life"]
+POLICY_TYPE_WEIGHTS = [0.5, 0.3, 0.2]
+SUM_INSURED_RANGES = {
+    "Health": (100_000, 1_000_000),
+    "Vehicle": (50_000, 1_500_000),
+    "Life": (500_000, 10_000_000),
+}
+STATUSES = ["Approved", "Pending", "Rejected"]
+STATUS_WEIGHTS = [0.6, 0.15, 0.25]
+REASONS = [
+    "Routine check-up", "Hospitalization", "Accident repair", "Windshield replacement",
+    "Surgery", "Theft", "Critical illness", "Outpatient treatment",
+]
+HISTORY_DAYS = 3 * 365
+MEAN_CLAIM_AGE_DAYS = 300
+
+
+def policyholder_rows(rnd, count):
+    for i in range(count):
+        policy_type = rnd.choices(POLICY_TYPES, POLICY_TYPE_WEIGHTS)[0]
+        low, high = SUM_INSURED_RANGES[policy_type]
+        yield {
+            'name': f"Policyholder {i + 1}",
+            'age': rnd.randint(18, 85),
+            'policy_type': policy_type,
+            'sum_insured': round(rnd.uniform(low, high), -3),
+        }
+
+
+def claim_rows(rnd, count, policyholders, today):
+    """`policyholders` is a list of (id, sum_insured); a minority of them file most claims."""
+    for _ in range(count):
+        ph_id, sum_insured = policyholders[int(len(policyholders) * rnd.random() ** 2)]
+        days_ago = min(int(rnd.expovariate(1 / MEAN_CLAIM_AGE_DAYS)), HISTORY_DAYS)
+        fraction = min(rnd.lognormvariate(-3.0, 1.2), 1.0)
+        yield {
+            'policyholder_id': ph_id,
+            'amount': round(max(sum_insured * fraction, 100.0), 2),
+            'reason': rnd.choice(REASONS),
+            'status': rnd.choices(STATUSES, STATUS_WEIGHTS)[0],
+            'date_of_claim': today - timedelta(days=days_ago),
+        }
+
+
+def _batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def reset(conn):
+    cur = conn.cursor()
+    try:
+        for table in ("claims_monthly_rollup", "policyholder_risk_state", "claims", "policyholders"):
+            cur.execute(f"DELETE FROM {table}")
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def generate(conn, claims, seed=42, batch_size=10_000, today=None):
+    """Inserts `claims` claims (and claims / 10 policyholders) and rebuilds the derived tables."""
+    rnd = random.Random(seed)
+    today = today or date.today()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM policyholders")
+        last_existing_id = cur.fetchone()[0]
+        for batch in _batched(policyholder_rows(rnd, max(claims // CLAIMS_PER_POLICYHOLDER, 1)), batch_size):
+            cur.executemany("""
+                INSERT INTO policyholders (name, age, policy_type, sum_insured)
+                VALUES (:name, :age, :policy_type, :sum_insured)
+            """, batch)
+            conn.commit()
+        cur.execute("SELECT id, sum_insured FROM policyholders WHERE id > :last_id ORDER BY id",
+                    {'last_id': last_existing_id})
+        policyholders = cur.fetchall()
+
+        for batch in _batched(claim_rows(rnd, claims, policyholders, today), batch_size):
+            cur.executemany("""
+                INSERT INTO claims (policyholder_id, amount, reason, status, date_of_claim)
+                VALUES (:policyholder_id, :amount, :reason, :status, :date_of_claim)
+            """, batch)
+            conn.commit()
+    finally:
+        cur.close()
+    risk_state.rebuild(conn)
+    rollup.rebuild(conn)
+    return len(policyholders)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill policyholders and claims with seeded synthetic data.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k", help="number of claims to generate")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--today", type=date.fromisoformat, default=None,
+                        help="anchor date for claim dates (YYYY-MM-DD); defaults to today")
+    parser.add_argument("--reset", action="store_true", help="delete existing data first")
+    args = parser.parse_args()
+
+    conn = database.connect()
+    try:
+        migrations.migrate(conn)
+        if args.reset:
+            reset(conn)
+        started = time.perf_counter()
+        policyholder_count = generate(conn, SCALES[args.scale], seed=args.seed,
+                                    batch_size=args.batch_size, today=args.today)
+        elapsed = time.perf_counter() - started
+    finally:
+        conn.close()
+    print(f"Generated {policyholder_count} policyholders and {SCALES[args.scale]} claims "
+          f"(scale {args.scale}, seed {args.seed}) in {elapsed:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
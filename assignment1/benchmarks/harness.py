@@ -0,0 +1,185 @@
+# benchmarks/harness.py
+"""
+Latency/throughput harness for the API's endpoint functions.
+
+Endpoints are called in-process (no HTTP server or network), with the response cache
+disabled so every iteration does the real work. Each benchmark runs a few warm-up calls,
+then `iterations` timed calls; p50/p95/p99 latency and calls per second are printed and
+written to benchmarks/results/<timestamp>-<label>.json.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import time
+from datetime import date, datetime
+
+from fastapi import Response
+from starlette.requests import Request
+
+import api
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def _request():
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": [], "query_string": b""})
+
+
+def _policyholder_ids():
+    conn = api.get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT id FROM policyholders")
+        return [row[0] for row in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.close()
+
+
+def bench_create_claim(rnd):
+    ids = _policyholder_ids()
+    if not ids:
+        raise SystemExit("No policyholders found; run benchmarks.generate first.")
+
+    def call():
+        api.create_claim(api.ClaimIn(
+            policyholder_id=rnd.choice(ids), amount=round(rnd.uniform(100, 5000), 2),
+            reason="Benchmark claim", status=rnd.choice(["Approved", "Pending", "Rejected"]),
+            date_of_claim=date.today()
+        ))
+    return call
+
+
+def bench_list_claims(rnd):
+    return lambda: api.list_claims(_request(), Response(), limit=api.DEFAULT_PAGE_SIZE, cursor=None)
+
+
+def bench_risk_analysis(rnd):
+    return lambda: api.compute_risk_analysis("state")
+
+
+def bench_risk_analysis_full(rnd):
+    return lambda: api.compute_risk_analysis("full")
+
+
+def bench_risk_analysis_parallel(rnd):
+    return lambda: api.compute_risk_analysis("parallel")
+
+
+def bench_risk_analysis_vectorized(rnd):
+    return lambda: api.compute_risk_analysis("vectorized")
+
+
+def bench_reports(rnd):
+    return lambda: api.compute_reports()
+
+
+BENCHMARKS = {
+    "create_claim": bench_create_claim,
+    "list_claims": bench_list_claims,
+    "risk_analysis": bench_risk_analysis,
+    "risk_analysis_full": bench_risk_analysis_full,
+    "risk_analysis_parallel": bench_risk_analysis_parallel,
+    "reports": bench_reports,
+}
+if api.risk_vectorized.available:
+    BENCHMARKS["risk_analysis_vectorized"] = bench_risk_analysis_vectorized
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def run_benchmark(call, iterations, warmup):
+    for _ in range(warmup):
+        call()
+    timings = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - started
+    timings.sort()
+    return {
+        "iterations": iterations,
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+        "mean_ms": round(sum(timings) / len(timings), 3),
+        "throughput_per_s": round(iterations / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    print(f"{'benchmark':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>10}")
+    for name, stats in results.items():
+        line = f"{name:<20}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['throughput_per_s']:>10.1f}"
+        previous = (baseline or {}).get(name)
+        if previous and previous["p50_ms"]:
+            change = (stats["p50_ms"] - previous["p50_ms"]) / previous["p50_ms"] * 100
+            line += f"   p50 {change:+.1f}% vs baseline"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the claims API endpoint functions.")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", nargs="*", choices=sorted(BENCHMARKS), help="subset of benchmarks to run")
+    parser.add_argument("--label", default="local", help="name for this run (e.g. the data scale)")
+    parser.add_argument("--compare", help="previous result file to compare against")
+    args = parser.parse_args()
+
+    api.response_cache.ttl_seconds = 0
+    api.open_pool()
+    rnd = random.Random(args.seed)
+    results = {}
+    try:
+        for name in args.only or BENCHMARKS:
+            results[name] = run_benchmark(BENCHMARKS[name](rnd), args.iterations, args.warmup)
+    finally:
+        api.close_pool()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(RESULTS_DIR, f"{stamp}-{args.label}.json")
+    with open(path, "w") as f:
+        json.dump({
+            "label": args.label,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "backend": api.backend.name,
+            "seed": args.seed,
+            "warmup": args.warmup,
+            "results": results,
+        }, f, indent=2)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
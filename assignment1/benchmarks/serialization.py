@@ -0,0 +1,99 @@
+# benchmarks/serialization.py
+"""
+Response encoding benchmark: the default FastAPI path against the fastjson path.
+
+Rows are fetched once, then each iteration only encodes them: response model validation,
+jsonable_encoder and stdlib json on the default path (the risk report has no response model),
+fastjson.dumps of dicts built straight from the cursor tuples on the other. Timings are the
+per-response serialization cost, without database or network time.
+"""
+import argparse
+from datetime import datetime, date
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import parse_obj_as
+
+import api
+import export
+import fastjson
+import repository
+from benchmarks.harness import run_benchmark
+
+
+def _default_response(model, content):
+    if model is not None:
+        content = parse_obj_as(model, content)
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def _fetch(rows):
+    conn = api.get_connection()
+    cur = conn.cursor()
+    try:
+        claims = repository.list_claims(cur, rows)
+        policyholders = repository.list_policyholders(cur, rows)
+    finally:
+        cur.close()
+        conn.close()
+    return claims, policyholders, api.compute_risk_analysis("state")
+
+
+def cases(rows):
+    """{name: (default call, fastjson call)} over freshly fetched rows."""
+    claims, policyholders, risk_report = _fetch(rows)
+    # The dicts list_claims builds for its response model.
+    claim_dicts = lambda: [
+        {
+            "id": r[0], "policyholder_id": r[1], "amount": r[2], "reason": r[3], "status": r[4],
+            "date_of_claim": r[5].isoformat() if isinstance(r[5], (datetime, date)) else str(r[5])
+        }
+        for r in claims
+    ]
+    policyholder_dicts = lambda: [
+        {"id": r[0], "name": r[1], "age": r[2], "policy_type": r[3], "sum_insured": r[4]}
+        for r in policyholders
+    ]
+    return {
+        "list_claims": (
+            lambda: _default_response(List[api.ClaimOut], claim_dicts()),
+            lambda: fastjson.dumps(fastjson.rows_as_dicts(export.CLAIM_COLUMNS, claims)),
+        ),
+        "list_policyholders": (
+            lambda: _default_response(List[api.PolicyholderOut], policyholder_dicts()),
+            lambda: fastjson.dumps(fastjson.rows_as_dicts(export.POLICYHOLDER_COLUMNS, policyholders)),
+        ),
+        "risk_analysis": (
+            lambda: _default_response(None, risk_report),
+            lambda: fastjson.dumps(risk_report),
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare default and fastjson response encoding.")
+    parser.add_argument("--rows", type=int, default=api.MAX_PAGE_SIZE, help="rows per list response")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    args = parser.parse_args()
+
+    api.response_cache.ttl_seconds = 0
+    api.open_pool()
+    try:
+        benchmarks = cases(args.rows)
+    finally:
+        api.close_pool()
+
+    encoder = "orjson" if fastjson.available else "stdlib json"
+    print(f"fastjson encoder: {encoder}")
+    print(f"{'response':<20}{'default p50 ms':>16}{'fastjson p50 ms':>17}{'speedup':>10}")
+    for name, (default_call, fast_call) in benchmarks.items():
+        default = run_benchmark(default_call, args.iterations, args.warmup)
+        fast = run_benchmark(fast_call, args.iterations, args.warmup)
+        speedup = default["p50_ms"] / fast["p50_ms"] if fast["p50_ms"] else float("inf")
+        print(f"{name:<20}{default['p50_ms']:>16.2f}{fast['p50_ms']:>17.2f}{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# cache.py
+"""
+Write-invalidated response cache for the analytics endpoints.
+
+Every cached response is keyed by the change versions of the tables it was computed from.
+Writes bump those versions, so a response computed before a write can never be served after
+it; entries also expire after a TTL and the oldest are evicted past a size limit. Writes made
+directly in the database bump nothing, so they show once the TTL has run out.
+
+By default versions and entries live in process memory. When a shared path is configured they
+are kept in a local SQLite file (WAL mode) instead, so every uvicorn worker on the machine sees
+the same versions and can reuse the same entries.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class ResponseCache:
+    def __init__(self, max_entries=256, ttl_seconds=30.0, shared_path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared_path = shared_path
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._versions = {}
+        self._local = threading.local()
+        # Identifies this version history, so ETags from another process or an earlier run
+        # (whose counters restarted) never match; workers sharing a store share its epoch.
+        self.epoch = uuid.uuid4().hex[:8]
+        if shared_path:
+            self.epoch = self._init_shared_store()
+
+    @property
+    def enabled(self):
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    # --- Table versions ---
+    def version(self, table):
+        if self.shared_path:
+            row = self._db().execute("SELECT version FROM versions WHERE name = ?", (table,)).fetchone()
+            return row[0] if row else 0
+        return self._versions.get(table, 0)
+
+    def bump(self, *tables):
+        """Records a write to `tables`; call after the write has committed."""
+        if self.shared_path:
+            db = self._db()
+            with db:
+                db.executemany("""
+                    INSERT INTO versions (name, version) VALUES (?, 1)
+                    ON CONFLICT(name) DO UPDATE SET version = version + 1
+                """, [(table,) for table in tables])
+            return
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def key(self, name, tables, *params):
+        """Cache key for `name(*params)` as of the current versions of `tables`."""
+        versions = ",".join(f"{table}:{self.version(table)}" for table in tables)
+        return f"{name}|{json.dumps(params, default=str)}|{versions}"
+
+    def etag(self, name, tables, *params):
+        """
+        Strong ETag for `name(*params)`; changes whenever one of `tables` is written through the
+        API. Versions only count those writes, so the ETag also turns over every TTL, bounding
+        how long a change made directly in the database can go unseen the same way cached
+        entries do (with caching disabled it never repeats).
+        """
+        period = int(time.time() // self.ttl_seconds) if self.ttl_seconds > 0 else time.time_ns()
+        digest = hashlib.sha1(f"{self.key(name, tables, *params)}|{period}".encode()).hexdigest()[:16]
+        return f'"{self.epoch}-{digest}"'
+
+    # --- Entries ---
+    def get(self, key):
+        """Returns (hit, value)."""
+        if not self.enabled:
+            return False, None
+        now = time.time()
+        if self.shared_path:
+            row = self._db().execute(
+                "SELECT value FROM entries WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            return (True, json.loads(row[0])) if row else (False, None)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if entry[0] <= now:
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, entry[1]
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        if self.shared_path:
+            db = self._db()
+            with db:
+                db.execute("INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+                           (key, json.dumps(value, default=str), expires_at))
+                db.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+                db.execute("""
+                    DELETE FROM entries WHERE key IN (
+                        SELECT key FROM entries ORDER BY expires_at DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_entries,))
+            return
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        if self.shared_path:
+            db = self._db()
+            with db:
+                db.execute("DELETE FROM entries")
+            return
+        with self._lock:
+            self._entries.clear()
+
+    # --- Shared store ---
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.shared_path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _init_shared_store(self):
+        db = self._db()
+        with db:
+            db.execute("CREATE TABLE IF NOT EXISTS versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+            db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+            db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            db.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('epoch', ?)", (self.epoch,))
+        return db.execute("SELECT value FROM meta WHERE name = 'epoch'").fetchone()[0]
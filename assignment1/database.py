@@ -1,60 +1,50 @@
-import oracledb   
+import sys
 
-def create_tables():
-    conn = oracledb.connect(
-        user="system",
-        password="shardul",
-        dsn = "localhost:1521/FREE"
-    )
-    cur = conn.cursor()
+import migrations
+import risk_state
+import rollup
+import storage
 
-    # Create policyholders table
-    cur.execute("""
-    BEGIN
-        EXECUTE IMMEDIATE '
-            CREATE TABLE policyholders (
-                id NUMBER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
-                name VARCHAR2(100),
-                age NUMBER,
-                policy_type VARCHAR2(20),
-                sum_insured NUMBER
-            )
-        ';
-    EXCEPTION
-        WHEN OTHERS THEN
-            IF SQLCODE != -955 THEN -- ORA-00955: name is already used by an existing object
-                RAISE;
-            END IF;
-    END;
-    """)
+def connect():
+    """A standalone connection to the configured backend (STORAGE_BACKEND, default oracle)."""
+    return storage.get_backend().connect()
 
-    # Create claims table
-    cur.execute("""
-    BEGIN
-        EXECUTE IMMEDIATE '
-            CREATE TABLE claims (
-                id NUMBER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
-                policyholder_id NUMBER REFERENCES policyholders(id),
-                amount NUMBER,
-                reason VARCHAR2(255),
-                status VARCHAR2(20),
-                date_of_claim DATE
-            )
-        ';
-    EXCEPTION
-        WHEN OTHERS THEN
-            IF SQLCODE != -955 THEN
-                RAISE;
-            END IF;
-    END;
-    """)
+def migrate_database(optional=()):
+    """Brings the schema up to date (replaces the old one-shot create_tables())."""
+    conn = connect()
+    try:
+        applied = migrations.migrate(conn, optional=optional)
+    finally:
+        conn.close()
+    print(f"Schema up to date ({len(applied)} migration(s) applied).")
 
-    conn.commit()
-    cur.close()
-    conn.close()
-    print("Tables created.")
+def rebuild_risk_state():
+    conn = connect()
+    try:
+        risk_state.rebuild(conn)
+    finally:
+        conn.close()
+    print("Risk state rebuilt.")
 
-if __name__ == "__main__":
-    create_tables()
+def rebuild_rollup():
+    conn = connect()
+    try:
+        rollup.rebuild(conn)
+    finally:
+        conn.close()
+    print("Monthly claims rollup rebuilt.")
 
-    
\ No newline at end of file
+# Usage (set STORAGE_BACKEND=sqlite and SQLITE_PATH to work on an embedded SQLite file):
+#   python database.py                       apply pending migrations
+#   python database.py --partition-claims    also apply the optional monthly claims partitioning
+#   python database.py --rebuild-risk-state  recompute policyholder_risk_state from claims
+#   python database.py --rebuild-rollup      recompute claims_monthly_rollup from claims
+if __name__ == "__main__":
+    if "--rebuild-risk-state" in sys.argv:
+        rebuild_risk_state()
+    elif "--rebuild-rollup" in sys.argv:
+        rebuild_rollup()
+    else:
+        migrate_database(optional=[
+            name for name in migrations.OPTIONAL_MIGRATIONS if f"--{name.replace('_', '-')}" in sys.argv
+        ])
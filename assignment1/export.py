@@ -0,0 +1,66 @@
+# export.py
+"""
+Row-by-row NDJSON/CSV encoders for the /export/ endpoints.
+
+Rows are pulled from an already executed cursor `arraysize` at a time and encoded as they
+arrive, so peak memory is one batch regardless of table size and the first chunk is sent
+while the rest of the result set is still being fetched.
+"""
+import csv
+import io
+import json
+from datetime import datetime, date
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+CLAIM_COLUMNS = ["id", "policyholder_id", "amount", "reason", "status", "date_of_claim"]
+POLICYHOLDER_COLUMNS = ["id", "name", "age", "policy_type", "sum_insured"]
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _ndjson_batch(columns, rows):
+    return "".join(
+        json.dumps(dict(zip(columns, map(_plain, row)))) + "\n"
+        for row in rows
+    )
+
+
+def _csv_batch(writer, buffer, rows):
+    for row in rows:
+        writer.writerow([_plain(value) for value in row])
+    chunk = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return chunk
+
+
+def stream_rows(conn, cur, columns, fmt):
+    """
+    Generator yielding encoded chunks from an executed cursor. It owns `cur` and `conn` and
+    releases them when the stream ends or the client disconnects.
+    """
+    try:
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            yield _csv_batch(writer, buffer, [])
+        while True:
+            rows = cur.fetchmany()
+            if not rows:
+                break
+            if fmt == "csv":
+                yield _csv_batch(writer, buffer, rows)
+            else:
+                yield _ndjson_batch(columns, rows)
+    finally:
+        cur.close()
+        conn.close()
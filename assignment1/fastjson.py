@@ -0,0 +1,66 @@
+# fastjson.py
+"""
+Fast JSON responses for large, trusted result sets (FAST_JSON_RESPONSES=true).
+
+FastAPI validates every item of a response against its response_model, walks the result
+again in jsonable_encoder and then encodes it with the stdlib json module. For rows that come
+straight from our own queries that validation buys nothing, so the list and risk endpoints can
+instead return a FastJSONResponse built directly from cursor tuples.
+
+orjson is used when installed (it encodes dates and datetimes natively); otherwise the stdlib
+encoder is used with the same compact output, which still skips the validation pass. Values
+are encoded as fetched, so a whole-number amount from an Oracle NUMBER column reads 500
+rather than the 500.0 the response model would produce.
+"""
+import json
+import os
+from datetime import datetime, date
+from decimal import Decimal
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # Optional: the stdlib encoder is used instead
+    orjson = None
+
+available = orjson is not None
+
+enabled = os.getenv("FAST_JSON_RESPONSES", "false").lower() in ("1", "true", "yes")
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content):
+    """Encodes `content` to compact UTF-8 JSON bytes; non-string dict keys become strings."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def rows_as_dicts(columns, rows):
+    """One {column: value} dict per cursor tuple, with no conversion or validation."""
+    return [dict(zip(columns, row)) for row in rows]
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content):
+        return dumps(content)
+
+
+def respond(content, response):
+    """
+    A FastJSONResponse for `content` carrying the headers already set on the endpoint's
+    `response` (ETag, next-page cursor), which FastAPI drops when a Response is returned.
+    """
+    return FastJSONResponse(content, headers=dict(response.headers))
@@ -0,0 +1,212 @@
+# jobs.py
+"""
+Job records and versioned result snapshots for the background analytics jobs (/jobs/...).
+
+A job computes one analytics response (`kind` plus its parameters) off the request path. When
+it succeeds its result is stored as the next snapshot version for that kind and parameters,
+so readers get the latest finished result instead of computing it inline. Jobs for a kind and
+parameters that are already queued or running are shared rather than queued twice.
+
+Like the response cache, records live in process memory by default; with a shared path they
+are kept in a local SQLite file so every uvicorn worker on the machine sees the same jobs and
+snapshots, whichever worker ran them.
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+ACTIVE = (QUEUED, RUNNING)
+
+
+def params_key(params):
+    return json.dumps(list(params), default=str)
+
+
+def _public(job):
+    return {name: value for name, value in job.items() if name != "source"}
+
+
+class JobStore:
+    def __init__(self, max_jobs=1000, snapshot_retention=5, shared_path=None):
+        self.max_jobs = max_jobs
+        self.snapshot_retention = snapshot_retention
+        self.shared_path = shared_path
+        self._lock = threading.Lock()
+        self._jobs = {}  # job id -> job, in creation order
+        self._snapshots = {}  # (kind, params key) -> [snapshot, ...], oldest first
+        self._local = threading.local()
+        if shared_path:
+            self._init_shared_store()
+
+    # --- Jobs ---
+    def create(self, kind, params):
+        """
+        Records a queued job computing `kind(*params)`. Returns (job, created); an already
+        queued or running job for the same kind and parameters is returned instead of a new one.
+        """
+        key = params_key(params)
+        job = {
+            "id": uuid.uuid4().hex, "kind": kind, "params": list(params), "status": QUEUED,
+            "created_at": time.time(), "started_at": None, "finished_at": None,
+            "error": None, "snapshot_version": None
+        }
+        if self.shared_path:
+            db = self._db()
+            with db:
+                db.execute("BEGIN IMMEDIATE")
+                row = db.execute(
+                    "SELECT id FROM jobs WHERE kind = ? AND params = ? AND status IN (?, ?)",
+                    (kind, key, *ACTIVE)
+                ).fetchone()
+                if row:
+                    return self.get(row[0]), False
+                db.execute("""
+                    INSERT INTO jobs (id, kind, params, status, created_at)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (job["id"], kind, key, QUEUED, job["created_at"]))
+                db.execute("""
+                    DELETE FROM jobs WHERE id IN (
+                        SELECT id FROM jobs WHERE status NOT IN (?, ?)
+                        ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                    )
+                """, (*ACTIVE, self.max_jobs))
+            return job, True
+        with self._lock:
+            for existing in self._jobs.values():
+                if existing["kind"] == kind and existing["status"] in ACTIVE and params_key(existing["params"]) == key:
+                    return _public(existing), False
+            self._jobs[job["id"]] = dict(job, source=None)
+            finished = [job_id for job_id, j in self._jobs.items() if j["status"] not in ACTIVE]
+            for job_id in finished[:max(len(finished) - self.max_jobs, 0)]:
+                del self._jobs[job_id]
+        return job, True
+
+    def get(self, job_id):
+        if self.shared_path:
+            row = self._db().execute("""
+                SELECT id, kind, params, status, created_at, started_at, finished_at, error, snapshot_version
+                FROM jobs WHERE id = ?
+            """, (job_id,)).fetchone()
+            if row is None:
+                return None
+            return {
+                "id": row[0], "kind": row[1], "params": json.loads(row[2]), "status": row[3],
+                "created_at": row[4], "started_at": row[5], "finished_at": row[6],
+                "error": row[7], "snapshot_version": row[8]
+            }
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return _public(job) if job is not None else None
+
+    def start(self, job_id, source):
+        """Marks the job running; `source` identifies the data version it computes from (a cache key)."""
+        self._update(job_id, status=RUNNING, started_at=time.time(), source=source)
+
+    def fail(self, job_id, error):
+        self._update(job_id, status=FAILED, finished_at=time.time(), error=error)
+
+    def succeed(self, job_id, result):
+        """Marks the job done and stores `result` as the next snapshot; returns its version."""
+        finished_at = time.time()
+        if self.shared_path:
+            db = self._db()
+            with db:
+                db.execute("BEGIN IMMEDIATE")
+                kind, key, source = db.execute(
+                    "SELECT kind, params, source FROM jobs WHERE id = ?", (job_id,)
+                ).fetchone()
+                version = db.execute(
+                    "SELECT COALESCE(MAX(version), 0) + 1 FROM snapshots WHERE kind = ? AND params = ?", (kind, key)
+                ).fetchone()[0]
+                db.execute("""
+                    INSERT INTO snapshots (kind, params, version, job_id, source, computed_at, result)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (kind, key, version, job_id, source, finished_at, json.dumps(result, default=str)))
+                db.execute(
+                    "DELETE FROM snapshots WHERE kind = ? AND params = ? AND version <= ?",
+                    (kind, key, version - self.snapshot_retention)
+                )
+                db.execute(
+                    "UPDATE jobs SET status = ?, finished_at = ?, snapshot_version = ? WHERE id = ?",
+                    (SUCCEEDED, finished_at, version, job_id)
+                )
+            return version
+        with self._lock:
+            job = self._jobs[job_id]
+            history = self._snapshots.setdefault((job["kind"], params_key(job["params"])), [])
+            version = history[-1]["version"] + 1 if history else 1
+            history.append({
+                "version": version, "job_id": job_id, "source": job["source"],
+                "computed_at": finished_at, "result": result
+            })
+            del history[:-self.snapshot_retention]
+            job.update(status=SUCCEEDED, finished_at=finished_at, snapshot_version=version)
+            return version
+
+    def _update(self, job_id, **fields):
+        if self.shared_path:
+            db = self._db()
+            with db:
+                assignments = ", ".join(f"{name} = ?" for name in fields)
+                db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            return
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    # --- Snapshots ---
+    def snapshot(self, kind, params, version=None):
+        """
+        The snapshot `version` (default: the latest) of `kind(*params)` as a dict with version,
+        job_id, source, computed_at and result; None when there is none.
+        """
+        key = params_key(params)
+        if self.shared_path:
+            query = "SELECT version, job_id, source, computed_at, result FROM snapshots WHERE kind = ? AND params = ?"
+            binds = (kind, key)
+            if version is None:
+                query += " ORDER BY version DESC LIMIT 1"
+            else:
+                query += " AND version = ?"
+                binds += (version,)
+            row = self._db().execute(query, binds).fetchone()
+            if row is None:
+                return None
+            return {"version": row[0], "job_id": row[1], "source": row[2], "computed_at": row[3],
+                    "result": json.loads(row[4])}
+        with self._lock:
+            history = self._snapshots.get((kind, key), [])
+            for snapshot in reversed(history):
+                if version is None or snapshot["version"] == version:
+                    return dict(snapshot)
+            return None
+
+    # --- Shared store ---
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.shared_path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _init_shared_store(self):
+        db = self._db()
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, kind TEXT NOT NULL, params TEXT NOT NULL, status TEXT NOT NULL,
+                source TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL,
+                error TEXT, snapshot_version INTEGER
+            )
+        """)
+        db.execute("CREATE INDEX IF NOT EXISTS jobs_kind_params_idx ON jobs (kind, params, status)")
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                kind TEXT NOT NULL, params TEXT NOT NULL, version INTEGER NOT NULL, job_id TEXT NOT NULL,
+                source TEXT NOT NULL, computed_at REAL NOT NULL, result TEXT NOT NULL,
+                PRIMARY KEY (kind, params, version)
+            )
+        """)
@@ -0,0 +1,259 @@
+# metrics.py
+"""
+In-process metrics, exposed by GET /metrics in the Prometheus text format.
+
+Request latency and in-flight counts are recorded by the API's HTTP middleware. Database time
+is recorded by InstrumentedConnection, which wraps every pooled connection the API hands out:
+pool acquire, statement execute and row fetch are timed separately, rows fetched are counted
+per statement, and each finished statement is handed to the slow-query log (slowlog.py). The
+same phases are summed per request (see RequestTimings) and returned in a Server-Timing header.
+"""
+import contextvars
+import re
+import threading
+import time
+
+import slowlog
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for label_values, values in sorted(series.items()):
+            for bound, count in zip(self.buckets, values):
+                le = _format_labels(self.labels, label_values, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {count}")
+            inf = _format_labels(self.labels, label_values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf} {values[-1]}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(values[-2])}")
+            lines.append(f"{self.name}_count{labels} {values[-1]}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}")
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("route", "method", "status")
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served.", ("route",))
+DB_ACQUIRE_TIME = Histogram("db_pool_acquire_seconds", "Time spent waiting for a pooled connection.")
+DB_CALL_TIME = Histogram(
+    "db_call_duration_seconds", "Database time per statement, split into execute and fetch.", ("phase", "statement")
+)
+DB_ROWS_FETCHED = Histogram(
+    "db_rows_fetched", "Rows fetched per executed query.", ("statement",), buckets=ROW_BUCKETS
+)
+
+REGISTRY = [REQUEST_LATENCY, REQUESTS_IN_FLIGHT, DB_ACQUIRE_TIME, DB_CALL_TIME, DB_ROWS_FETCHED]
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Per-request timings ---
+class RequestTimings:
+    """Database time per phase for one request; shared by every thread working on it."""
+
+    def __init__(self):
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    def add(self, phase, seconds):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def server_timing(self, total_seconds):
+        with self._lock:
+            phases = dict(self.phases)
+        entries = [f"db-{phase};dur={seconds * 1000:.2f}" for phase, seconds in phases.items()]
+        entries.append(f"total;dur={total_seconds * 1000:.2f}")
+        return ", ".join(entries)
+
+
+current_timings = contextvars.ContextVar("current_timings", default=None)
+
+
+def record_db_time(phase, seconds, statement=None):
+    if statement is None:
+        DB_ACQUIRE_TIME.observe(seconds)
+    else:
+        DB_CALL_TIME.observe(seconds, phase, statement)
+    timings = current_timings.get()
+    if timings is not None:
+        timings.add(phase, seconds)
+
+
+# --- Instrumented DB access ---
+_STATEMENT_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE)\s+([A-Za-z_][A-Za-z0-9_]*)", re.IGNORECASE)
+
+
+def statement_label(sql):
+    """A low-cardinality label for a SQL statement: its verb and first table, e.g. 'SELECT claims'."""
+    words = sql.split(None, 1)
+    verb = words[0].upper() if words else ""
+    match = _STATEMENT_TABLE.search(sql)
+    return f"{verb} {match.group(1).lower()}" if match else verb
+
+
+class InstrumentedCursor:
+    """Cursor proxy that times execute and fetch calls and counts the rows fetched."""
+
+    def __init__(self, cursor):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_statement", None)
+        object.__setattr__(self, "_sql", None)
+        object.__setattr__(self, "_binds", None)
+        object.__setattr__(self, "_elapsed", 0.0)
+        object.__setattr__(self, "_rows", None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+    def _finish_statement(self):
+        if self._statement is None:
+            return
+        if self._rows is not None:
+            DB_ROWS_FETCHED.observe(self._rows, self._statement)
+        rows = self._rows if self._rows is not None else getattr(self._cursor, "rowcount", None)
+        slowlog.observe(self._cursor, self._sql, self._binds, self._elapsed, rows)
+        object.__setattr__(self, "_statement", None)
+        object.__setattr__(self, "_rows", None)
+
+    def _start_statement(self, sql, binds):
+        self._finish_statement()
+        object.__setattr__(self, "_statement", statement_label(sql))
+        object.__setattr__(self, "_sql", sql)
+        object.__setattr__(self, "_binds", binds)
+        object.__setattr__(self, "_elapsed", 0.0)
+
+    def _timed(self, phase, method, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            object.__setattr__(self, "_elapsed", self._elapsed + elapsed)
+            record_db_time(phase, elapsed, self._statement)
+
+    def execute(self, sql, binds=None, **kwargs):
+        self._start_statement(sql, binds)
+        if binds is None:
+            return self._timed("execute", self._cursor.execute, sql, **kwargs)
+        return self._timed("execute", self._cursor.execute, sql, binds, **kwargs)
+
+    def executemany(self, sql, rows, **kwargs):
+        self._start_statement(sql, rows)
+        return self._timed("execute", self._cursor.executemany, sql, rows, **kwargs)
+
+    def _count(self, rows):
+        object.__setattr__(self, "_rows", (self._rows or 0) + rows)
+
+    def fetchone(self):
+        row = self._timed("fetch", self._cursor.fetchone)
+        self._count(0 if row is None else 1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._timed("fetch", self._cursor.fetchmany, *args, **kwargs)
+        self._count(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._timed("fetch", self._cursor.fetchall)
+        self._count(len(rows))
+        return rows
+
+    def __iter__(self):
+        # Iterating fetches arraysize rows per call, so the fetch timing covers whole batches.
+        while True:
+            rows = self.fetchmany()
+            if not rows:
+                return
+            yield from rows
+
+    def close(self):
+        self._finish_statement()
+        self._cursor.close()
+
+
+class InstrumentedConnection:
+    """Connection proxy whose cursors are InstrumentedCursors."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs))
@@ -0,0 +1,176 @@
+# migrations.py
+"""
+Versioned schema migrations.
+
+Each migration runs once, in version order, and is recorded in schema_migrations. DDL is
+written once for every storage backend: column types are {placeholders} filled from the
+backend's type map, and the backend wraps each statement so that objects created by the old
+one-shot create_tables() are accepted as already present, which lets existing installations
+adopt the runner without manual steps. Optional migrations (e.g. partitioning) are only
+applied when explicitly requested.
+"""
+import functools
+
+import risk_state
+import rollup
+import storage
+
+
+MIGRATIONS = [
+    {
+        "version": 1,
+        "description": "create policyholders and claims",
+        "steps": [
+            """
+                CREATE TABLE policyholders (
+                    id {id_pk},
+                    name {text100},
+                    age {integer},
+                    policy_type {text20},
+                    sum_insured {decimal}
+                )
+            """,
+            """
+                CREATE TABLE claims (
+                    id {id_pk},
+                    policyholder_id {integer} REFERENCES policyholders(id),
+                    amount {decimal},
+                    reason {text255},
+                    status {text20},
+                    date_of_claim {date}
+                )
+            """,
+        ],
+    },
+    {
+        "version": 2,
+        "description": "create policyholder_risk_state",
+        "steps": [
+            """
+                CREATE TABLE policyholder_risk_state (
+                    policyholder_id {integer} PRIMARY KEY REFERENCES policyholders(id),
+                    total_claims {integer} DEFAULT 0 NOT NULL,
+                    approved_claims {integer} DEFAULT 0 NOT NULL,
+                    recent_approved_count {integer} DEFAULT 0 NOT NULL,
+                    max_approved_ratio {decimal} DEFAULT 0 NOT NULL,
+                    max_rejected_ratio {decimal} DEFAULT 0 NOT NULL,
+                    flagged_claim_id {integer},
+                    flagged_claim_amount {decimal},
+                    high_risk {flag} DEFAULT 0 NOT NULL
+                )
+            """,
+            # risk_state_meta, where rebuilds record their rules, only exists from version 6 on.
+            functools.partial(risk_state.rebuild, record_rules=False),
+        ],
+    },
+    {
+        "version": 3,
+        "description": "index claims by policyholder, status/date and amount",
+        "steps": [
+            # Per-policyholder lookups, the foreign key and the risk window recount
+            "CREATE INDEX claims_policyholder_idx ON claims (policyholder_id)",
+            # Pending-claim lookup and date-bounded status filters
+            "CREATE INDEX claims_status_date_idx ON claims (status, date_of_claim)",
+            # Highest-claim report (ORDER BY amount DESC, first row)
+            "CREATE INDEX claims_amount_idx ON claims (amount)",
+        ],
+    },
+    {
+        "version": 4,
+        "description": "partition claims by month of date_of_claim",
+        "optional": "partition_claims",
+        "backends": ("oracle",),
+        "steps": [
+            # Online conversion (Oracle 12.2+); new months get their own partition automatically.
+            """
+                ALTER TABLE claims MODIFY
+                PARTITION BY RANGE (date_of_claim) INTERVAL (NUMTOYMINTERVAL(1, 'MONTH'))
+                (PARTITION claims_p_initial VALUES LESS THAN (DATE '2000-01-01'))
+                ONLINE UPDATE INDEXES
+            """,
+        ],
+    },
+    {
+        "version": 5,
+        "description": "create claims_monthly_rollup",
+        "steps": [
+            """
+                CREATE TABLE claims_monthly_rollup (
+                    claim_month {text20} NOT NULL,
+                    policy_type {text20} NOT NULL,
+                    status {text20} NOT NULL,
+                    claim_count {integer} DEFAULT 0 NOT NULL,
+                    amount_sum {decimal} DEFAULT 0 NOT NULL,
+                    amount_min {decimal},
+                    amount_max {decimal},
+                    CONSTRAINT claims_monthly_rollup_pk PRIMARY KEY (claim_month, policy_type, status)
+                )
+            """,
+            rollup.rebuild,
+        ],
+    },
+    {
+        "version": 6,
+        "description": "record the risk rules policyholder_risk_state was built under",
+        "steps": [
+            """
+                CREATE TABLE risk_state_meta (
+                    name {text20} PRIMARY KEY,
+                    value {text100} NOT NULL
+                )
+            """,
+            # The existing state's rules are unknown, so it is rebuilt under the active ones.
+            risk_state.rebuild,
+        ],
+    },
+]
+
+OPTIONAL_MIGRATIONS = sorted({m["optional"] for m in MIGRATIONS if "optional" in m})
+
+
+def applied_versions(cur, backend):
+    cur.execute(backend.ddl("""
+        CREATE TABLE schema_migrations (
+            version {integer} PRIMARY KEY,
+            description {text200},
+            applied_at {date} DEFAULT {now}
+        )
+    """.format(**backend.types)))
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+
+def migrate(conn, optional=(), backend=None):
+    """
+    Applies every pending migration in version order. Optional migrations run only when their
+    name is listed in `optional`; backend-specific ones are skipped on other backends.
+    Returns the versions applied by this call.
+    """
+    backend = backend or storage.get_backend()
+    cur = conn.cursor()
+    try:
+        done = applied_versions(cur, backend)
+        applied = []
+        for migration in MIGRATIONS:
+            if migration["version"] in done:
+                continue
+            if "optional" in migration and migration["optional"] not in optional:
+                continue
+            if backend.name not in migration.get("backends", (backend.name,)):
+                print(f"Skipped migration {migration['version']}: not supported on {backend.name}")
+                continue
+            for step in migration["steps"]:
+                if callable(step):
+                    step(conn)
+                else:
+                    cur.execute(backend.ddl(step.format(**backend.types)))
+            cur.execute(
+                "INSERT INTO schema_migrations (version, description) VALUES (:version, :description)",
+                {'version': migration["version"], 'description': migration["description"]}
+            )
+            conn.commit()
+            applied.append(migration["version"])
+            print(f"Applied migration {migration['version']}: {migration['description']}")
+        return applied
+    finally:
+        cur.close()
@@ -0,0 +1,109 @@
+# reports.py
+"""
+The individual /reports/ queries. Each takes its own cursor so the API can run them
+concurrently on separate pooled connections; the report then takes as long as the slowest
+query instead of the sum of all four.
+
+Monthly counts and average amounts are read from claims_monthly_rollup (see rollup.py).
+Every query honours the same optional inclusive YYYY-MM range. The small rollup queries take
+unset bounds as NULL binds, so their statement text stays fixed; the queries on claims only
+write out the bounds that are set, since `(:bound IS NULL OR ...)` keeps Oracle from range
+scanning the date_of_claim indexes.
+"""
+from datetime import date, datetime
+
+import storage
+
+
+def month_range(from_month=None, to_month=None):
+    """Bind values for an optional inclusive YYYY-MM range. Raises ValueError on bad input."""
+    from_date = datetime.strptime(from_month, '%Y-%m').date() if from_month else None
+    to_date = last_month = None
+    if to_month:
+        last_month = datetime.strptime(to_month, '%Y-%m').date()
+        # Exclusive upper bound: first day of the month after to_month
+        to_date = date(last_month.year + last_month.month // 12, last_month.month % 12 + 1, 1)
+    if from_date and to_date and from_date >= to_date:
+        raise ValueError("from_month must not be after to_month")
+    # strptime also accepts e.g. '2026-1'; the rollup compares claim_month as zero-padded text.
+    return {
+        'from_month': from_date.strftime('%Y-%m') if from_date else None,
+        'to_month': last_month.strftime('%Y-%m') if last_month else None,
+        'from_date': from_date, 'to_date': to_date,
+    }
+
+
+def claim_date_conditions(period, column):
+    """SQL conditions on the claim date `column` for the bounds of `period` that are set, and their binds."""
+    conditions = []
+    binds = {}
+    if period['from_date']:
+        conditions.append(f"{column} >= :from_date")
+        binds['from_date'] = period['from_date']
+    if period['to_date']:
+        conditions.append(f"{column} < :to_date")
+        binds['to_date'] = period['to_date']
+    return conditions, binds
+
+
+def claims_per_month(cur, period):
+    cur.execute("""
+        SELECT claim_month, SUM(claim_count) AS claim_count
+        FROM claims_monthly_rollup
+        WHERE (:from_month IS NULL OR claim_month >= :from_month)
+          AND (:to_month IS NULL OR claim_month <= :to_month)
+        GROUP BY claim_month
+        ORDER BY claim_month
+    """, {'from_month': period['from_month'], 'to_month': period['to_month']})
+    return {row[0]: row[1] for row in cur.fetchall()}
+
+
+def avg_claim_by_type(cur, period):
+    # Every policy type held by a policyholder is listed, with 0 when it has no approved claims.
+    cur.execute("""
+        SELECT t.policy_type, COALESCE(SUM(r.amount_sum) / NULLIF(SUM(r.claim_count), 0), 0) AS avg_amount
+        FROM (SELECT DISTINCT policy_type FROM policyholders) t
+        LEFT JOIN claims_monthly_rollup r
+               ON r.policy_type = t.policy_type AND r.status = 'Approved'
+              AND (:from_month IS NULL OR r.claim_month >= :from_month)
+              AND (:to_month IS NULL OR r.claim_month <= :to_month)
+        GROUP BY t.policy_type
+    """, {'from_month': period['from_month'], 'to_month': period['to_month']})
+    return {row[0]: round(float(row[1]), 2) for row in cur.fetchall()}
+
+
+def highest_claim(cur, period):
+    conditions, binds = claim_date_conditions(period, "date_of_claim")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    cur.execute(f"""
+        SELECT id, amount, policyholder_id
+        FROM claims
+        {where}
+        ORDER BY amount DESC
+        {storage.get_backend().limit('top_rows')}
+    """, dict(binds, top_rows=1))
+    row = cur.fetchone()
+    return {'id': row[0], 'amount': float(row[1]), 'policyholder_id': row[2]} if row else None
+
+
+def policyholders_with_pending_claims(cur, period):
+    # A semi-join rather than an IN list of ids (one parse per range shape, no 1000-bind limit).
+    conditions, binds = claim_date_conditions(period, "c.date_of_claim")
+    cur.execute(f"""
+        SELECT p.name
+        FROM policyholders p
+        WHERE EXISTS (
+            SELECT 1 FROM claims c
+            WHERE {' AND '.join(["c.policyholder_id = p.id", "c.status = 'Pending'"] + conditions)}
+        )
+    """, binds)
+    return [r[0] for r in cur.fetchall()]
+
+
+# Response key -> query, in response order.
+REPORT_QUERIES = {
+    'claims_per_month': claims_per_month,
+    'avg_claim_by_type': avg_claim_by_type,
+    'highest_claim': highest_claim,
+    'policyholders_with_pending_claims': policyholders_with_pending_claims,
+}
@@ -0,0 +1,156 @@
+# repository.py
+"""
+Policyholder and claim SQL used by the API endpoints.
+
+Every function takes an open cursor from the configured storage backend and leaves
+transactions to the caller; dialect differences go through the backend's shims.
+"""
+import storage
+
+INSERT_POLICYHOLDER_SQL = """
+    INSERT INTO policyholders (name, age, policy_type, sum_insured)
+    VALUES (:name, :age, :policy_type, :sum_insured)
+"""
+
+INSERT_CLAIM_SQL = """
+    INSERT INTO claims (policyholder_id, amount, reason, status, date_of_claim)
+    VALUES (:policyholder_id, :amount, :reason, :status, :date_of_claim)
+"""
+
+EXPORT_CLAIMS_SQL = "SELECT id, policyholder_id, amount, reason, status, date_of_claim FROM claims ORDER BY id"
+EXPORT_POLICYHOLDERS_SQL = "SELECT id, name, age, policy_type, sum_insured FROM policyholders ORDER BY id"
+
+
+def claim_binds(cl):
+    return {
+        'policyholder_id': cl.policyholder_id, 'amount': cl.amount, 'reason': cl.reason,
+        'status': cl.status, 'date_of_claim': cl.date_of_claim
+    }
+
+
+# --- Policyholders ---
+def insert_policyholder(cur, ph):
+    """Inserts one policyholder and returns its generated id."""
+    return storage.get_backend().insert_returning_id(cur, INSERT_POLICYHOLDER_SQL, {
+        'name': ph.name, 'age': ph.age, 'policy_type': ph.policy_type, 'sum_insured': ph.sum_insured
+    })
+
+
+def insert_policyholders(cur, rows):
+    """Inserts policyholder bind dicts; returns (offset, code, message) for each rejected row."""
+    return storage.get_backend().executemany_collect_errors(cur, INSERT_POLICYHOLDER_SQL, rows)
+
+
+def list_policyholders(cur, fetch_rows, after_id=None):
+    """Up to `fetch_rows` policyholders ordered by id, starting after `after_id`."""
+    limit = storage.get_backend().limit('fetch_rows')
+    if after_id is None:
+        cur.execute(f"""
+            SELECT id, name, age, policy_type, sum_insured FROM policyholders
+            ORDER BY id
+            {limit}
+        """, {'fetch_rows': fetch_rows})
+    else:
+        cur.execute(f"""
+            SELECT id, name, age, policy_type, sum_insured FROM policyholders
+            WHERE id > :after_id
+            ORDER BY id
+            {limit}
+        """, {'after_id': after_id, 'fetch_rows': fetch_rows})
+    return cur.fetchall()
+
+
+# --- Claims ---
+def insert_claim(cur, cl):
+    """Inserts one claim and returns its generated id."""
+    return storage.get_backend().insert_returning_id(cur, INSERT_CLAIM_SQL, claim_binds(cl))
+
+
+def insert_claims(cur, claims):
+    """
+    Inserts claims as one batch. Returns (ids, errors): the generated id per claim (None where
+    it was rejected) and (offset, code, message) per rejected claim.
+    """
+    return storage.get_backend().insert_many_returning_ids(
+        cur, INSERT_CLAIM_SQL, [claim_binds(cl) for cl in claims]
+    )
+
+
+def list_claims(cur, fetch_rows, after=None):
+    """Up to `fetch_rows` claims, newest first, starting after the (date_of_claim, id) `after`."""
+    limit = storage.get_backend().limit('fetch_rows')
+    if after is None:
+        cur.execute(f"""
+            SELECT id, policyholder_id, amount, reason, status, date_of_claim FROM claims
+            ORDER BY date_of_claim DESC, id DESC
+            {limit}
+        """, {'fetch_rows': fetch_rows})
+    else:
+        cur.execute(f"""
+            SELECT id, policyholder_id, amount, reason, status, date_of_claim FROM claims
+            WHERE date_of_claim < :after_date
+               OR (date_of_claim = :after_date AND id < :after_id)
+            ORDER BY date_of_claim DESC, id DESC
+            {limit}
+        """, {'after_date': after[0], 'after_id': after[1], 'fetch_rows': fetch_rows})
+    return cur.fetchall()
+
+
+# --- Analytics inputs ---
+def dashboard_counts(cur):
+    """Returns (policyholder count, {status: claim count}) from one grouped query."""
+    cur.execute("""
+        SELECT 'policyholders' AS kind, NULL AS status, COUNT(*) FROM policyholders
+        UNION ALL
+        SELECT 'claims', status, COUNT(*) FROM claims GROUP BY status
+    """)
+    policyholder_count = 0
+    claims_by_status = {}
+    for kind, status, count in cur.fetchall():
+        if kind == 'policyholders':
+            policyholder_count = count
+        else:
+            claims_by_status[status] = count
+    return policyholder_count, claims_by_status
+
+
+def risk_policyholders(cur):
+    cur.execute("SELECT id, name, sum_insured, policy_type FROM policyholders")
+    return cur.fetchall()
+
+
+def risk_claims(cur):
+    """Executes the full claims scan for the risk engine; iterate the cursor for the rows."""
+    cur.execute("SELECT id, policyholder_id, amount, status, date_of_claim FROM claims")
+    return cur
+
+
+# --- Point lookups ---
+# ID lists are padded to one of these sizes (repeating the last ID), so lookups of any size
+# share a handful of statement texts; 1000 is Oracle's IN-list limit.
+IN_LIST_BUCKETS = (1, 10, 100, 1000)
+
+
+def in_list(ids):
+    """(placeholder text, binds) for `IN (...)` over 1..1000 ids."""
+    size = next(size for size in IN_LIST_BUCKETS if len(ids) <= size)
+    padded = list(ids) + [ids[-1]] * (size - len(ids))
+    binds = {f"id{i}": ph_id for i, ph_id in enumerate(padded)}
+    return ", ".join(f":{name}" for name in binds), binds
+
+
+def risk_policyholders_by_ids(cur, ids):
+    placeholders, binds = in_list(ids)
+    cur.execute(f"SELECT id, name, sum_insured, policy_type FROM policyholders WHERE id IN ({placeholders})", binds)
+    return cur.fetchall()
+
+
+def risk_claims_by_policyholders(cur, ids):
+    """Claims of the given policyholders via the policyholder_id index; iterate the cursor for the rows."""
+    placeholders, binds = in_list(ids)
+    cur.execute(f"""
+        SELECT id, policyholder_id, amount, status, date_of_claim FROM claims
+        WHERE policyholder_id IN ({placeholders})
+        ORDER BY policyholder_id, id
+    """, binds)
+    return cur
@@ -0,0 +1,153 @@
+# risk.py
+"""
+Single-pass risk engine behind /risk_analysis/.
+
+Claims are grouped by policyholder while they stream off the cursor, so the rejected >80%,
+approved-in-last-year and approved >80% rules and both policy-type histograms are all
+computed in one walk over the claims instead of one scan per policyholder.
+
+Thresholds come from the active rule set (risk_rules.py); the constants below are the
+defaults that apply when no rules file is configured.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, date
+
+import risk_rules
+
+RATIO_THRESHOLD = risk_rules.DEFAULT_RULES.ratio_threshold
+RECENT_APPROVED_LIMIT = risk_rules.DEFAULT_RULES.recent_approved_limit
+WINDOW_DAYS = risk_rules.DEFAULT_RULES.window_days
+
+
+def window_start(now=None, days=WINDOW_DAYS):
+    """First claim date that still counts as 'in the last year' (or the last `days` days)."""
+    now = now or datetime.now()
+    return (now - timedelta(days=days)).date()
+
+
+def as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return None
+
+
+def new_state():
+    """Per-policyholder accumulator: the facts the three risk rules need."""
+    return {
+        "rejected_over_limit": False,
+        "recent_approved_count": 0,
+        "flagged_claim": None,  # (claim_id, amount) of the first approved claim over the limit
+    }
+
+
+def build_policyholder_map(policyholder_rows):
+    """Maps (id, name, sum_insured, policy_type) rows by id, keeping fetch order."""
+    return {
+        ph_id: {"name": name, "sum_insured": si, "policy_type": pt}
+        for ph_id, name, si, pt in policyholder_rows
+    }
+
+
+def accumulate_claims(policyholder_map, claim_rows, now=None, rules=None):
+    """
+    Walks (id, policyholder_id, amount, status, date_of_claim) rows exactly once.
+    Returns (states, approved_by_policy_type, total_by_policy_type).
+    """
+    # Thresholds and window starts are resolved per policy type up front, not per claim.
+    params_by_type, default_params = (rules or risk_rules.active).compile_python(now)
+    states = {}
+    approved_by_type = defaultdict(int)
+    total_by_type = defaultdict(int)
+    for claim_id, ph_id, amount, status, claim_date in claim_rows:
+        ph_info = policyholder_map.get(ph_id)
+        if ph_info is None:
+            continue
+        policy_type = ph_info["policy_type"]
+        total_by_type[policy_type] += 1
+        threshold, since = params_by_type.get(policy_type, default_params)
+
+        state = states.get(ph_id)
+        if state is None:
+            state = states[ph_id] = new_state()
+        sum_insured = ph_info["sum_insured"]
+        insured = bool(sum_insured and sum_insured > 0)
+
+        if status == 'Rejected':
+            if insured and (amount / sum_insured) > threshold:
+                state["rejected_over_limit"] = True
+        elif status == 'Approved':
+            approved_by_type[policy_type] += 1
+            claim_day = as_date(claim_date)
+            if claim_day and claim_day >= since:
+                state["recent_approved_count"] += 1
+            if state["flagged_claim"] is None and insured and (amount / sum_insured) > threshold:
+                state["flagged_claim"] = (claim_id, amount)
+    return states, approved_by_type, total_by_type
+
+
+def build_report(policyholder_map, states, approved_by_type, total_by_type, rules=None):
+    """Turns per-policyholder states into the /risk_analysis/ response body."""
+    rules = rules or risk_rules.active
+    risk_report = []
+    high_risk_policyholders_details = []
+    empty_state = new_state()
+
+    for ph_id, ph_info in policyholder_map.items():
+        state = states.get(ph_id, empty_state)
+        ph_rules = rules.for_type(ph_info["policy_type"])
+
+        if state["rejected_over_limit"]:
+            risk_report.append({
+                'policyholder_id': ph_id, 'name': ph_info["name"],
+                'risk_status_message': rules.rejected_skip_message(ph_rules),
+                'high_risk': False,
+                'reason': rules.rejected_skip_reason(ph_rules)
+            })
+            continue
+
+        recent_approved_claims_count = state["recent_approved_count"]
+        is_high_risk = False
+        risk_reasons = []
+
+        if recent_approved_claims_count > ph_rules.recent_approved_limit:
+            is_high_risk = True
+            risk_reasons.append(f"{recent_approved_claims_count} approved claims {rules.window_text(ph_rules)}.")
+
+        if state["flagged_claim"] is not None:
+            app_claim_id, app_claim_amount = state["flagged_claim"]
+            is_high_risk = True
+            risk_reasons.append(f"An approved claim (ID: {app_claim_id}, Amount: {app_claim_amount:.2f}) exceeds {rules.percent(ph_rules)} of sum insured ({ph_info['sum_insured']:.2f}).")
+
+        if is_high_risk:
+            risk_report.append({
+                'policyholder_id': ph_id, 'name': ph_info["name"],
+                'risk_status_message': "High Risk", 'high_risk': True,
+                'reason': "; ".join(risk_reasons) if risk_reasons else "High risk conditions met."
+            })
+            high_risk_policyholders_details.append({
+                'policyholder_id': ph_id, 'name': ph_info["name"],
+                'reason_for_high_risk': "; ".join(risk_reasons) if risk_reasons else "High risk conditions met.",
+                'recent_accepted_claims_count': recent_approved_claims_count
+            })
+        else:
+            risk_report.append({
+                'policyholder_id': ph_id, 'name': ph_info["name"],
+                'risk_status_message': "Standard Risk", 'high_risk': False,
+                'reason': "No high-risk conditions met based on approved claims."
+            })
+
+    return {
+        "risk_analysis_report": risk_report,
+        "high_risk_summary": high_risk_policyholders_details,
+        "claims_by_policy_type_approved": dict(approved_by_type),
+        "total_claims_by_policy_type": dict(total_by_type)
+    }
+
+
+def evaluate_risk(policyholder_rows, claim_rows, now=None, rules=None):
+    """Full risk analysis from policyholder and claim rows (claim_rows may be a live cursor)."""
+    policyholder_map = build_policyholder_map(policyholder_rows)
+    states, approved_by_type, total_by_type = accumulate_claims(policyholder_map, claim_rows, now, rules)
+    return build_report(policyholder_map, states, approved_by_type, total_by_type, rules)
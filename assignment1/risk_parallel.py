@@ -0,0 +1,98 @@
+# risk_parallel.py
+"""
+Sharded full-history risk analysis (/risk_analysis/?mode=parallel).
+
+Policyholders are split into contiguous ID ranges holding roughly equal numbers of
+policyholders. Each range is scored in a worker process on its own pooled connection with
+range-bounded policyholder and claims queries (every claim lands in the shard of its
+policyholder, so per-policyholder rules need no cross-shard state) and returns its part of the
+report. The parent concatenates the per-policyholder lists in shard order and sums the
+policy-type counts, so policyholders are listed in ID order.
+"""
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import risk
+import storage
+
+# NTILE keeps shards balanced by policyholder count even when IDs have gaps.
+SHARD_BOUNDS_SQL = """
+    SELECT MIN(id), MAX(id)
+    FROM (SELECT id, NTILE(:shards) OVER (ORDER BY id) AS shard FROM policyholders) t
+    GROUP BY shard
+    ORDER BY 1
+"""
+
+SHARD_POLICYHOLDERS_SQL = """
+    SELECT id, name, sum_insured, policy_type FROM policyholders
+    WHERE id BETWEEN :low AND :high
+    ORDER BY id
+"""
+
+SHARD_CLAIMS_SQL = """
+    SELECT id, policyholder_id, amount, status, date_of_claim FROM claims
+    WHERE policyholder_id BETWEEN :low AND :high
+"""
+
+
+def create_executor(workers):
+    # Workers are spawned, not forked, so they never inherit the parent's pool or threads.
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def shard_bounds(cur, shards):
+    """(low, high) policyholder ID ranges, at most `shards` of them, in ID order."""
+    cur.execute(SHARD_BOUNDS_SQL, {'shards': shards})
+    return [(low, high) for low, high in cur.fetchall()]
+
+
+def score_shard(low, high, now, arraysize):
+    """Worker entry point: the report for the policyholders with IDs in [low, high]."""
+    conn = storage.get_backend().acquire()  # The worker process's own pool
+    cur = None
+    try:
+        cur = conn.cursor()
+        cur.arraysize = arraysize
+        cur.execute(SHARD_POLICYHOLDERS_SQL, {'low': low, 'high': high})
+        policyholder_rows = cur.fetchall()
+        policyholder_map = risk.build_policyholder_map(policyholder_rows)
+        cur.execute(SHARD_CLAIMS_SQL, {'low': low, 'high': high})
+        states, approved_by_type, total_by_type = risk.accumulate_claims(policyholder_map, cur, now)
+        return risk.build_report(policyholder_map, states, approved_by_type, total_by_type)
+    finally:
+        if cur: cur.close()
+        conn.close()
+
+
+def merge(shard_reports):
+    """Combines per-shard reports (in shard order) into one report."""
+    risk_report = []
+    high_risk_summary = []
+    approved_by_type = defaultdict(int)
+    total_by_type = defaultdict(int)
+    for report in shard_reports:
+        risk_report.extend(report["risk_analysis_report"])
+        high_risk_summary.extend(report["high_risk_summary"])
+        for policy_type, count in report["claims_by_policy_type_approved"].items():
+            approved_by_type[policy_type] += count
+        for policy_type, count in report["total_claims_by_policy_type"].items():
+            total_by_type[policy_type] += count
+    return {
+        "risk_analysis_report": risk_report,
+        "high_risk_summary": high_risk_summary,
+        "claims_by_policy_type_approved": dict(approved_by_type),
+        "total_claims_by_policy_type": dict(total_by_type)
+    }
+
+
+def evaluate_risk(executor, cur, shards, arraysize, now=None):
+    """Scores every shard on `executor` and merges the results; `cur` is used for shard bounds."""
+    # Every shard scores against the same instant; workers load the same rules file at startup.
+    now = now or datetime.now()
+    futures = [
+        executor.submit(score_shard, low, high, now, arraysize)
+        for low, high in shard_bounds(cur, shards)
+    ]
+    return merge(future.result() for future in futures)
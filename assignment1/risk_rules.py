@@ -0,0 +1,159 @@
+# risk_rules.py
+"""
+Configurable risk rule thresholds, optionally per policy type.
+
+The three risk rules are fixed; their parameters are not:
+
+    ratio_threshold        claim amount / sum insured above which a rejected claim skips the
+                           assessment and an approved claim flags the policyholder (0.80)
+    recent_approved_limit  more approved claims than this inside the window is high risk (3)
+    window_days            length of the rolling "recent" window in days (365)
+
+A JSON or YAML file named by RISK_RULES_PATH overrides the defaults and/or sets them per
+policy type; it is read once at import (i.e. API startup) into `active`:
+
+    {"defaults": {"ratio_threshold": 0.8},
+     "policy_types": {"Life": {"ratio_threshold": 0.6, "recent_approved_limit": 5}}}
+
+A RuleSet is compiled once into what each engine needs: a per-type lookup for the Python
+engines, SQL CASE expressions over policy_type for the persisted risk state and per-type arrays
+for the vectorized engine, so per-type rules add no extra pass over the claims. Changing the
+rules of a running installation requires `python database.py --rebuild-risk-state`.
+"""
+import hashlib
+import json
+import os
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+try:
+    import yaml
+except ImportError:  # Optional: only needed for YAML rule files
+    yaml = None
+
+Rules = namedtuple("Rules", ["ratio_threshold", "recent_approved_limit", "window_days"])
+
+DEFAULT_RULES = Rules(ratio_threshold=0.80, recent_approved_limit=3, window_days=365)
+
+
+def _parse_rules(values, base, where):
+    if not isinstance(values, dict):
+        raise ValueError(f"{where} must be a mapping of rule parameters")
+    unknown = set(values) - set(Rules._fields)
+    if unknown:
+        raise ValueError(f"{where}: unknown rule parameter(s) {', '.join(sorted(unknown))}")
+    rules = base._replace(**values)
+    if not (isinstance(rules.ratio_threshold, (int, float)) and rules.ratio_threshold > 0):
+        raise ValueError(f"{where}: ratio_threshold must be a positive number")
+    for field in ("recent_approved_limit", "window_days"):
+        value = getattr(rules, field)
+        if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+            raise ValueError(f"{where}: {field} must be a non-negative integer")
+    return rules._replace(ratio_threshold=float(rules.ratio_threshold))
+
+
+def _sql_literal(value):
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return repr(value)
+
+
+class RuleSet:
+    def __init__(self, defaults=DEFAULT_RULES, by_type=None):
+        self.defaults = defaults
+        self.by_type = dict(by_type or {})
+        # Distinct window lengths, each bound once as :window_start_<i> in SQL.
+        self.window_days = sorted({defaults.window_days, *(r.window_days for r in self.by_type.values())})
+        self._sql = {}
+
+    @classmethod
+    def from_dict(cls, data):
+        data = data or {}
+        unknown = set(data) - {"defaults", "policy_types"}
+        if unknown:
+            raise ValueError(f"Unknown risk rules section(s): {', '.join(sorted(unknown))}")
+        defaults = _parse_rules(data.get("defaults", {}), DEFAULT_RULES, "defaults")
+        by_type = {
+            policy_type: _parse_rules(values, defaults, f"policy_types.{policy_type}")
+            for policy_type, values in (data.get("policy_types") or {}).items()
+        }
+        return cls(defaults, by_type)
+
+    def for_type(self, policy_type):
+        return self.by_type.get(policy_type, self.defaults)
+
+    def to_dict(self):
+        return {
+            "defaults": self.defaults._asdict(),
+            "policy_types": {policy_type: rules._asdict() for policy_type, rules in self.by_type.items()},
+        }
+
+    @property
+    def fingerprint(self):
+        """Short hash of the effective rules, for cache keys."""
+        return hashlib.sha1(json.dumps(self.to_dict(), sort_keys=True).encode()).hexdigest()[:12]
+
+    # --- Compiled forms ---
+    def sql(self, field, column="p.policy_type"):
+        """
+        SQL expression for a rule parameter of the policy type in `column`: a CASE over the
+        overridden types, or a plain literal when none override the default. "window_start"
+        yields :window_start_<i> binds (see window_starts()).
+        """
+        key = (field, column)
+        if key not in self._sql:
+            if field == "window_start":
+                render = lambda rules: f":window_start_{self.window_days.index(rules.window_days)}"
+            else:
+                render = lambda rules: _sql_literal(getattr(rules, field))
+            default = render(self.defaults)
+            overrides = [(t, render(r)) for t, r in self.by_type.items() if render(r) != default]
+            if overrides:
+                whens = " ".join(f"WHEN {_sql_literal(t)} THEN {value}" for t, value in overrides)
+                self._sql[key] = f"(CASE {column} {whens} ELSE {default} END)"
+            else:
+                self._sql[key] = default
+        return self._sql[key]
+
+    def window_starts(self, now=None):
+        """Bind values for the :window_start_<i> parameters in the compiled SQL."""
+        now = now or datetime.now()
+        return {f"window_start_{i}": (now - timedelta(days=days)).date() for i, days in enumerate(self.window_days)}
+
+    def compile_python(self, now=None):
+        """{policy_type: (ratio_threshold, window start date)} plus the default, for per-claim lookups."""
+        now = now or datetime.now()
+        compile_one = lambda rules: (rules.ratio_threshold, (now - timedelta(days=rules.window_days)).date())
+        return {policy_type: compile_one(rules) for policy_type, rules in self.by_type.items()}, compile_one(self.defaults)
+
+    # --- Report wording ---
+    def rejected_skip_message(self, rules):
+        return f"Risk assessment skipped: Policyholder has a rejected claim exceeding {self.percent(rules)} of sum insured."
+
+    def rejected_skip_reason(self, rules):
+        return f"A rejected claim >{self.percent(rules)} of sum insured exists."
+
+    @staticmethod
+    def percent(rules):
+        return f"{rules.ratio_threshold * 100:g}%"
+
+    @staticmethod
+    def window_text(rules):
+        return "in the last year" if rules.window_days == 365 else f"in the last {rules.window_days} days"
+
+
+def load(path):
+    """Reads a RuleSet from a .json, .yaml or .yml file."""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise RuntimeError("YAML risk rules require the 'PyYAML' package.")
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    return RuleSet.from_dict(data)
+
+
+RISK_RULES_PATH = os.getenv("RISK_RULES_PATH")
+
+active = load(RISK_RULES_PATH) if RISK_RULES_PATH else RuleSet()
@@ -0,0 +1,286 @@
+# risk_state.py
+"""
+Persisted per-policyholder risk state (table policyholder_risk_state).
+
+Claim writes fold each new claim into its policyholder's row in the same transaction, so
+/risk_analysis/ only has to read this table. The rolling approval window is the one input that
+changes without a write; refresh_window() recounts it and is run periodically by the API.
+
+The statements below are templates: {ratio_threshold}, {recent_approved_limit} and
+{window_start} are filled in with the active rule set's SQL (risk_rules.RuleSet.sql), so
+per-policy-type thresholds are applied by the database, against policyholders `p`.
+"""
+import risk
+import risk_rules
+import storage
+
+# One upsert per claim: bumps the counters, keeps the max approved/rejected ratios against
+# sum_insured and remembers the first approved claim over the ratio threshold. The claim's
+# threshold and whether it is a recent approval depend on the policy type, so they are
+# resolved in the source query. Keyed by storage backend: Oracle has MERGE, SQLite
+# INSERT ... ON CONFLICT.
+APPLY_CLAIM_SQL = {}
+APPLY_CLAIM_SQL["oracle"] = """
+    MERGE INTO policyholder_risk_state s
+    USING (
+        SELECT p.id AS policyholder_id,
+               CASE WHEN p.sum_insured > 0 THEN :amount / p.sum_insured END AS ratio,
+               {ratio_threshold} AS threshold,
+               CASE WHEN :approved = 1 AND :date_of_claim >= {window_start} THEN 1 ELSE 0 END AS recent_approved
+        FROM policyholders p
+        WHERE p.id = :policyholder_id
+    ) c
+    ON (s.policyholder_id = c.policyholder_id)
+    WHEN MATCHED THEN UPDATE SET
+        s.total_claims = s.total_claims + 1,
+        s.approved_claims = s.approved_claims + :approved,
+        s.recent_approved_count = s.recent_approved_count + c.recent_approved,
+        s.max_approved_ratio = CASE WHEN :approved = 1 THEN GREATEST(s.max_approved_ratio, COALESCE(c.ratio, 0))
+                                    ELSE s.max_approved_ratio END,
+        s.max_rejected_ratio = CASE WHEN :rejected = 1 THEN GREATEST(s.max_rejected_ratio, COALESCE(c.ratio, 0))
+                                    ELSE s.max_rejected_ratio END,
+        s.flagged_claim_id = CASE WHEN s.flagged_claim_id IS NULL AND :approved = 1 AND c.ratio > c.threshold
+                                  THEN :claim_id ELSE s.flagged_claim_id END,
+        s.flagged_claim_amount = CASE WHEN s.flagged_claim_id IS NULL AND :approved = 1 AND c.ratio > c.threshold
+                                      THEN :amount ELSE s.flagged_claim_amount END
+    WHEN NOT MATCHED THEN INSERT (
+        policyholder_id, total_claims, approved_claims, recent_approved_count,
+        max_approved_ratio, max_rejected_ratio, flagged_claim_id, flagged_claim_amount, high_risk
+    ) VALUES (
+        c.policyholder_id, 1, :approved, c.recent_approved,
+        CASE WHEN :approved = 1 THEN COALESCE(c.ratio, 0) ELSE 0 END,
+        CASE WHEN :rejected = 1 THEN COALESCE(c.ratio, 0) ELSE 0 END,
+        CASE WHEN :approved = 1 AND c.ratio > c.threshold THEN :claim_id END,
+        CASE WHEN :approved = 1 AND c.ratio > c.threshold THEN :amount END,
+        0
+    )
+"""
+APPLY_CLAIM_SQL["sqlite"] = """
+    INSERT INTO policyholder_risk_state (
+        policyholder_id, total_claims, approved_claims, recent_approved_count,
+        max_approved_ratio, max_rejected_ratio, flagged_claim_id, flagged_claim_amount, high_risk
+    )
+    SELECT c.policyholder_id, 1, :approved, c.recent_approved,
+           CASE WHEN :approved = 1 THEN COALESCE(c.ratio, 0) ELSE 0 END,
+           CASE WHEN :rejected = 1 THEN COALESCE(c.ratio, 0) ELSE 0 END,
+           CASE WHEN :approved = 1 AND c.ratio > c.threshold THEN :claim_id END,
+           CASE WHEN :approved = 1 AND c.ratio > c.threshold THEN :amount END,
+           0
+    FROM (
+        SELECT p.id AS policyholder_id,
+               CASE WHEN p.sum_insured > 0 THEN :amount / p.sum_insured END AS ratio,
+               {ratio_threshold} AS threshold,
+               CASE WHEN :approved = 1 AND :date_of_claim >= {window_start} THEN 1 ELSE 0 END AS recent_approved
+        FROM policyholders p
+        WHERE p.id = :policyholder_id
+    ) c
+    WHERE true
+    ON CONFLICT (policyholder_id) DO UPDATE SET
+        total_claims = total_claims + 1,
+        approved_claims = approved_claims + excluded.approved_claims,
+        recent_approved_count = recent_approved_count + excluded.recent_approved_count,
+        max_approved_ratio = MAX(max_approved_ratio, excluded.max_approved_ratio),
+        max_rejected_ratio = MAX(max_rejected_ratio, excluded.max_rejected_ratio),
+        flagged_claim_id = COALESCE(flagged_claim_id, excluded.flagged_claim_id),
+        flagged_claim_amount = CASE WHEN flagged_claim_id IS NULL THEN excluded.flagged_claim_amount
+                                    ELSE flagged_claim_amount END
+"""
+
+# high_risk mirrors the rules in risk.build_report: not skipped for a large rejected claim, and
+# either too many recent approved claims or an approved claim over the ratio threshold.
+# The state table has no policy type, so per-type rules look it up by {policy_type}.
+HIGH_RISK_EXPR = """
+    CASE WHEN max_rejected_ratio <= {ratio_threshold}
+              AND (recent_approved_count > {recent_approved_limit} OR flagged_claim_id IS NOT NULL)
+         THEN 1 ELSE 0 END
+"""
+STATE_POLICY_TYPE = "(SELECT p.policy_type FROM policyholders p WHERE p.id = policyholder_risk_state.policyholder_id)"
+
+UPDATE_HIGH_RISK_SQL = """
+    UPDATE policyholder_risk_state
+    SET high_risk = {high_risk}
+    WHERE policyholder_id = :policyholder_id
+"""
+
+UPDATE_ALL_HIGH_RISK_SQL = "UPDATE policyholder_risk_state SET high_risk = {high_risk}"
+
+REBUILD_SQL = """
+    INSERT INTO policyholder_risk_state (
+        policyholder_id, total_claims, approved_claims, recent_approved_count,
+        max_approved_ratio, max_rejected_ratio, flagged_claim_id, high_risk
+    )
+    SELECT c.policyholder_id,
+           COUNT(*),
+           SUM(CASE WHEN c.status = 'Approved' THEN 1 ELSE 0 END),
+           SUM(CASE WHEN c.status = 'Approved' AND c.date_of_claim >= {window_start} THEN 1 ELSE 0 END),
+           COALESCE(MAX(CASE WHEN c.status = 'Approved' AND p.sum_insured > 0 THEN c.amount / p.sum_insured END), 0),
+           COALESCE(MAX(CASE WHEN c.status = 'Rejected' AND p.sum_insured > 0 THEN c.amount / p.sum_insured END), 0),
+           MIN(CASE WHEN c.status = 'Approved' AND p.sum_insured > 0 AND c.amount / p.sum_insured > {ratio_threshold}
+                    THEN c.id END),
+           0
+    FROM claims c
+    JOIN policyholders p ON p.id = c.policyholder_id
+    GROUP BY c.policyholder_id
+"""
+
+REFRESH_WINDOW_SQL = """
+    UPDATE policyholder_risk_state
+    SET recent_approved_count = (
+        SELECT COUNT(*) FROM claims c
+        JOIN policyholders p ON p.id = c.policyholder_id
+        WHERE c.policyholder_id = policyholder_risk_state.policyholder_id
+          AND c.status = 'Approved'
+          AND c.date_of_claim >= {window_start}
+    )
+    WHERE recent_approved_count > 0
+"""
+
+READ_STATE_SQL = """
+    SELECT p.id, p.name, p.sum_insured, p.policy_type,
+           s.total_claims, s.approved_claims, s.recent_approved_count,
+           s.max_rejected_ratio, s.flagged_claim_id, s.flagged_claim_amount
+    FROM policyholders p
+    LEFT JOIN policyholder_risk_state s ON s.policyholder_id = p.id
+"""
+
+
+# Statement texts per (rules fingerprint, backend), compiled on first use.
+_compiled = {}
+
+
+def compiled_sql(rules=None):
+    """The statements above with the rule set's SQL filled in."""
+    rules = rules or risk_rules.active
+    backend = storage.get_backend().name
+    key = (rules.fingerprint, backend)
+    if key not in _compiled:
+        params = {field: rules.sql(field) for field in ("ratio_threshold", "recent_approved_limit", "window_start")}
+        high_risk = HIGH_RISK_EXPR.format(
+            ratio_threshold=rules.sql("ratio_threshold", STATE_POLICY_TYPE),
+            recent_approved_limit=rules.sql("recent_approved_limit", STATE_POLICY_TYPE),
+        )
+        _compiled[key] = {
+            "apply_claim": APPLY_CLAIM_SQL[backend].format(**params),
+            "update_high_risk": UPDATE_HIGH_RISK_SQL.format(high_risk=high_risk),
+            "update_all_high_risk": UPDATE_ALL_HIGH_RISK_SQL.format(high_risk=high_risk),
+            "rebuild": REBUILD_SQL.format(**params),
+            "refresh_window": REFRESH_WINDOW_SQL.format(**params),
+        }
+    return _compiled[key]
+
+
+def claim_binds(claim_id, policyholder_id, amount, status, date_of_claim, window_starts):
+    """Bind values for APPLY_CLAIM_SQL; the status tests are decided here, once."""
+    return {
+        'claim_id': claim_id, 'policyholder_id': policyholder_id, 'amount': amount,
+        'approved': 1 if status == 'Approved' else 0,
+        'rejected': 1 if status == 'Rejected' else 0,
+        'date_of_claim': date_of_claim,
+        **window_starts
+    }
+
+
+def apply_claims(cur, claims):
+    """
+    Folds newly inserted claims into the risk state. `claims` holds
+    (claim_id, policyholder_id, amount, status, date_of_claim) tuples; the caller commits.
+    """
+    if not claims:
+        return
+    sql = compiled_sql()
+    window_starts = risk_rules.active.window_starts()
+    # Concurrent first claims of one policyholder race to insert its row; see upsert_many().
+    storage.get_backend().upsert_many(cur, sql["apply_claim"], [claim_binds(*claim, window_starts) for claim in claims])
+    policyholder_ids = dict.fromkeys(claim[1] for claim in claims)
+    cur.executemany(sql["update_high_risk"], [{'policyholder_id': ph_id} for ph_id in policyholder_ids])
+
+
+class RulesMismatch(Exception):
+    """The persisted state was built under other risk rules than the active ones."""
+
+
+RULES_FINGERPRINT_KEY = "rules_fingerprint"
+
+
+def stored_rules_fingerprint(cur):
+    """Fingerprint of the rule set the state was last rebuilt under (None if never recorded)."""
+    cur.execute("SELECT value FROM risk_state_meta WHERE name = :name", {'name': RULES_FINGERPRINT_KEY})
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def check_rules(cur):
+    """Raises RulesMismatch unless the state was rebuilt under the active rule set."""
+    stored = stored_rules_fingerprint(cur)
+    if stored != risk_rules.active.fingerprint:
+        raise RulesMismatch(
+            f"Risk state was built under risk rules {stored or 'of unknown version'}, but rules "
+            f"{risk_rules.active.fingerprint} are active; run `python database.py --rebuild-risk-state`."
+        )
+
+
+def rebuild(conn, record_rules=True):
+    """
+    Recomputes the whole table from claims (backfill, after out-of-band data changes or a risk
+    rules change) and records the active rules' fingerprint in risk_state_meta.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("DELETE FROM policyholder_risk_state")
+        sql = compiled_sql()
+        cur.execute(sql["rebuild"], risk_rules.active.window_starts())
+        cur.execute("""
+            UPDATE policyholder_risk_state
+            SET flagged_claim_amount = (
+                SELECT c.amount FROM claims c WHERE c.id = policyholder_risk_state.flagged_claim_id
+            )
+            WHERE flagged_claim_id IS NOT NULL
+        """)
+        cur.execute(sql["update_all_high_risk"])
+        if record_rules:
+            cur.execute("DELETE FROM risk_state_meta WHERE name = :name", {'name': RULES_FINGERPRINT_KEY})
+            cur.execute("INSERT INTO risk_state_meta (name, value) VALUES (:name, :value)",
+                        {'name': RULES_FINGERPRINT_KEY, 'value': risk_rules.active.fingerprint})
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def refresh_window(conn):
+    """Expires approved claims that have aged out of the rolling window."""
+    cur = conn.cursor()
+    try:
+        sql = compiled_sql()
+        cur.execute(sql["refresh_window"], risk_rules.active.window_starts())
+        cur.execute(sql["update_all_high_risk"])
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def load_report(cur):
+    """
+    Builds the /risk_analysis/ response from the persisted state alone. Raises RulesMismatch
+    when the state is from other risk rules, rather than serving results under the old ones.
+    """
+    check_rules(cur)
+    cur.execute(READ_STATE_SQL)
+    policyholder_rows = []
+    states = {}
+    approved_by_type = {}
+    total_by_type = {}
+    for (ph_id, name, sum_insured, policy_type, total_claims, approved_claims,
+         recent_approved, max_rejected_ratio, flagged_claim_id, flagged_claim_amount) in cur:
+        policyholder_rows.append((ph_id, name, sum_insured, policy_type))
+        if not total_claims:
+            continue
+        total_by_type[policy_type] = total_by_type.get(policy_type, 0) + total_claims
+        if approved_claims:
+            approved_by_type[policy_type] = approved_by_type.get(policy_type, 0) + approved_claims
+        states[ph_id] = {
+            "rejected_over_limit": (max_rejected_ratio or 0) > risk_rules.active.for_type(policy_type).ratio_threshold,
+            "recent_approved_count": recent_approved or 0,
+            "flagged_claim": (flagged_claim_id, flagged_claim_amount) if flagged_claim_id is not None else None,
+        }
+    policyholder_map = risk.build_policyholder_map(policyholder_rows)
+    return risk.build_report(policyholder_map, states, approved_by_type, total_by_type)
@@ -0,0 +1,144 @@
+# risk_vectorized.py
+"""
+NumPy implementation of the full-history risk engine (/risk_analysis/?mode=vectorized).
+
+Claims are fetched as all-numeric rows (status and claim date are encoded in SQL). The driver
+still builds one Python tuple per fetched row, but the rule logic does not run per claim: each
+fetchmany batch is converted to column arrays in one call. The three risk rules (with
+per-policy-type thresholds from risk_rules) and both policy-type histograms are then array
+operations over those columns, and the per-policyholder results go through risk.build_report,
+so the response is identical to risk.evaluate_risk.
+
+NumPy is optional: `available` is False when it is not installed.
+"""
+from datetime import date
+
+import risk
+import risk_rules
+import storage
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency, only needed for mode=vectorized
+    np = None
+
+available = np is not None
+
+STATUS_OTHER, STATUS_APPROVED, STATUS_REJECTED = 0, 1, 2
+NO_DATE = np.iinfo(np.int32).min if available else None
+EPOCH = date(1970, 1, 1)
+
+
+def claims_sql():
+    days = storage.get_backend().epoch_days("date_of_claim")
+    return f"""
+        SELECT id, policyholder_id, amount,
+               CASE status WHEN 'Approved' THEN {STATUS_APPROVED} WHEN 'Rejected' THEN {STATUS_REJECTED}
+                           ELSE {STATUS_OTHER} END,
+               {days}
+        FROM claims
+    """
+
+
+def load_claim_columns(cur):
+    """
+    Executes the claims query and returns (ids, policyholder_ids, amounts, statuses, days)
+    arrays in cursor order. Missing policyholder ids are -1 and missing dates NO_DATE.
+    """
+    storage.get_backend().fetch_numbers_as_floats(cur)
+    cur.execute(claims_sql())
+    chunks = []
+    while True:
+        rows = cur.fetchmany()
+        if not rows:
+            break
+        block = np.array(rows, dtype=np.float64).reshape(-1, 5)  # None becomes NaN
+        ph = block[:, 1]
+        days = block[:, 4]
+        chunks.append((
+            block[:, 0].astype(np.int64),
+            np.where(np.isnan(ph), -1, ph).astype(np.int64),
+            block[:, 2].copy(),
+            block[:, 3].astype(np.int8),
+            np.where(np.isnan(days), NO_DATE, days).astype(np.int32),
+        ))
+    if not chunks:
+        return (np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float64),
+                np.empty(0, np.int8), np.empty(0, np.int32))
+    return tuple(np.concatenate(column) for column in zip(*chunks))
+
+
+def _counts_in_first_seen_order(type_codes, policy_types):
+    """{policy_type: count} over claim type codes, keyed in order of first appearance."""
+    if type_codes.size == 0:
+        return {}
+    codes, first_index, counts = np.unique(type_codes, return_index=True, return_counts=True)
+    order = np.argsort(first_index)
+    return {policy_types[codes[i]]: int(counts[i]) for i in order}
+
+
+def evaluate_risk(policyholder_rows, claim_columns, now=None, rules=None):
+    """Vectorized equivalent of risk.evaluate_risk over load_claim_columns() output."""
+    rules = rules or risk_rules.active
+    policyholder_map = risk.build_policyholder_map(policyholder_rows)
+    claim_ids, claim_ph_ids, amounts, statuses, days = claim_columns
+
+    # Policyholder columns, in map order
+    ph_ids = np.fromiter(policyholder_map.keys(), dtype=np.int64, count=len(policyholder_map))
+    sum_insured = np.array([
+        info["sum_insured"] if info["sum_insured"] is not None else np.nan
+        for info in policyholder_map.values()
+    ], dtype=np.float64)
+    policy_types = list(dict.fromkeys(info["policy_type"] for info in policyholder_map.values()))
+    type_code = {policy_type: code for code, policy_type in enumerate(policy_types)}
+    ph_type_codes = np.array([type_code[info["policy_type"]] for info in policyholder_map.values()], dtype=np.int64)
+    # Per-type rule parameters, looked up per claim through its type code.
+    params_by_type, default_params = rules.compile_python(now)
+    type_params = [params_by_type.get(policy_type, default_params) for policy_type in policy_types]
+    type_threshold = np.array([threshold for threshold, _ in type_params], dtype=np.float64)
+    type_since_days = np.array([(since - EPOCH).days for _, since in type_params], dtype=np.int32)
+
+    # Resolve each claim's policyholder to its position; claims without a known policyholder are ignored.
+    order = np.argsort(ph_ids, kind="stable")
+    sorted_ids = ph_ids[order]
+    pos = np.searchsorted(sorted_ids, claim_ph_ids)
+    pos = np.minimum(pos, max(len(sorted_ids) - 1, 0))
+    known = (sorted_ids[pos] == claim_ph_ids) if len(sorted_ids) else np.zeros(len(claim_ph_ids), dtype=bool)
+    keep = np.flatnonzero(known)
+    claim_ph = order[pos[keep]]
+    claim_ids, amounts, statuses, days = claim_ids[keep], amounts[keep], statuses[keep], days[keep]
+    claim_types = ph_type_codes[claim_ph]
+
+    claim_sum_insured = sum_insured[claim_ph]
+    insured = claim_sum_insured > 0  # NaN (no sum insured) compares False
+    with np.errstate(divide="ignore", invalid="ignore"):
+        over_limit = insured & (amounts / np.where(insured, claim_sum_insured, 1.0) > type_threshold[claim_types])
+    approved = statuses == STATUS_APPROVED
+    rejected = statuses == STATUS_REJECTED
+
+    recent = approved & (days != NO_DATE) & (days >= type_since_days[claim_types])
+
+    n_ph = len(ph_ids)
+    claim_counts = np.bincount(claim_ph, minlength=n_ph)
+    recent_counts = np.bincount(claim_ph[recent], minlength=n_ph)
+    rejected_over = np.zeros(n_ph, dtype=bool)
+    rejected_over[claim_ph[rejected & over_limit]] = True
+    # First approved claim over the limit per policyholder, in cursor order.
+    flagged = np.flatnonzero(approved & over_limit)
+    flagged_ph, first = np.unique(claim_ph[flagged], return_index=True)
+    flagged_claim = {
+        int(ph): (int(claim_ids[flagged[i]]), float(amounts[flagged[i]]))
+        for ph, i in zip(flagged_ph, first)
+    }
+
+    states = {}
+    for index in np.flatnonzero(claim_counts):
+        state = risk.new_state()
+        state["rejected_over_limit"] = bool(rejected_over[index])
+        state["recent_approved_count"] = int(recent_counts[index])
+        state["flagged_claim"] = flagged_claim.get(int(index))
+        states[int(ph_ids[index])] = state
+
+    approved_by_type = _counts_in_first_seen_order(claim_types[approved], policy_types)
+    total_by_type = _counts_in_first_seen_order(claim_types, policy_types)
+    return risk.build_report(policyholder_map, states, approved_by_type, total_by_type, rules)
@@ -0,0 +1,99 @@
+# rollup.py
+"""
+Pre-aggregated monthly claims rollup (table claims_monthly_rollup).
+
+One row per month x policy type x status holds the claim count and the sum, min and max
+amount. Claim writes fold new claims into it in the same transaction, so /reports/ reads a
+few hundred rollup rows instead of grouping the whole claims table. Claims without a
+policyholder or date (which the API cannot create) are not rolled up.
+"""
+from collections import defaultdict
+
+import storage
+
+# Folds an aggregate of new claims (count/sum/min/max) into one rollup row, keyed by backend.
+APPLY_SQL = {}
+APPLY_SQL["oracle"] = """
+    MERGE INTO claims_monthly_rollup r
+    USING (
+        SELECT :claim_month AS claim_month, p.policy_type, :status AS status
+        FROM policyholders p
+        WHERE p.id = :policyholder_id
+    ) c
+    ON (r.claim_month = c.claim_month AND r.policy_type = c.policy_type AND r.status = c.status)
+    WHEN MATCHED THEN UPDATE SET
+        r.claim_count = r.claim_count + :claim_count,
+        r.amount_sum = r.amount_sum + :amount_sum,
+        r.amount_min = LEAST(r.amount_min, :amount_min),
+        r.amount_max = GREATEST(r.amount_max, :amount_max)
+    WHEN NOT MATCHED THEN INSERT (
+        claim_month, policy_type, status, claim_count, amount_sum, amount_min, amount_max
+    ) VALUES (
+        c.claim_month, c.policy_type, c.status, :claim_count, :amount_sum, :amount_min, :amount_max
+    )
+"""
+APPLY_SQL["sqlite"] = """
+    INSERT INTO claims_monthly_rollup (
+        claim_month, policy_type, status, claim_count, amount_sum, amount_min, amount_max
+    )
+    SELECT :claim_month, p.policy_type, :status, :claim_count, :amount_sum, :amount_min, :amount_max
+    FROM policyholders p
+    WHERE p.id = :policyholder_id
+    ON CONFLICT (claim_month, policy_type, status) DO UPDATE SET
+        claim_count = claim_count + excluded.claim_count,
+        amount_sum = amount_sum + excluded.amount_sum,
+        amount_min = MIN(amount_min, excluded.amount_min),
+        amount_max = MAX(amount_max, excluded.amount_max)
+"""
+
+REBUILD_SQL = """
+    INSERT INTO claims_monthly_rollup (
+        claim_month, policy_type, status, claim_count, amount_sum, amount_min, amount_max
+    )
+    SELECT {month}, p.policy_type, c.status,
+           COUNT(*), COALESCE(SUM(c.amount), 0), MIN(c.amount), MAX(c.amount)
+    FROM claims c
+    JOIN policyholders p ON p.id = c.policyholder_id
+    WHERE c.date_of_claim IS NOT NULL AND p.policy_type IS NOT NULL AND c.status IS NOT NULL
+    GROUP BY {month}, p.policy_type, c.status
+"""
+
+
+def month_of(claim_date):
+    return claim_date.strftime('%Y-%m')
+
+
+def apply_claims(cur, claims):
+    """
+    Folds newly inserted claims into the rollup. `claims` holds
+    (claim_id, policyholder_id, amount, status, date_of_claim) tuples; the caller commits.
+    Claims sharing a month, policyholder and status are pre-aggregated into one MERGE.
+    """
+    groups = defaultdict(lambda: [0, 0, None, None])
+    for _, policyholder_id, amount, status, claim_date in claims:
+        group = groups[(month_of(claim_date), policyholder_id, status)]
+        group[0] += 1
+        group[1] += amount
+        group[2] = amount if group[2] is None else min(group[2], amount)
+        group[3] = amount if group[3] is None else max(group[3], amount)
+    if not groups:
+        return
+    backend = storage.get_backend()
+    backend.upsert_many(cur, APPLY_SQL[backend.name], [
+        {
+            'claim_month': claim_month, 'policyholder_id': policyholder_id, 'status': status,
+            'claim_count': count, 'amount_sum': total, 'amount_min': low, 'amount_max': high
+        }
+        for (claim_month, policyholder_id, status), (count, total, low, high) in groups.items()
+    ])
+
+
+def rebuild(conn):
+    """Recomputes the rollup from claims (backfill, or after out-of-band data changes)."""
+    cur = conn.cursor()
+    try:
+        cur.execute("DELETE FROM claims_monthly_rollup")
+        cur.execute(REBUILD_SQL.format(month=storage.get_backend().month("c.date_of_claim")))
+        conn.commit()
+    finally:
+        cur.close()
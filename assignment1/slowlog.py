@@ -0,0 +1,98 @@
+# slowlog.py
+"""
+Slow-query log.
+
+InstrumentedCursor (metrics.py) reports every finished statement here with its SQL text, bind
+count, elapsed time (execute plus fetches) and row count. Statements over the threshold are
+written as one JSON object per line to the "slow_query" logger (stderr, or SLOW_QUERY_LOG_PATH)
+and kept in a small in-memory ring for GET /admin/slow_query_log. In explain mode the
+execution plan is captured as well. All settings can be changed at runtime via
+PUT /admin/slow_query_log.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import storage
+
+settings = {
+    "enabled": os.getenv("SLOW_QUERY_LOG_ENABLED", "true").lower() in ("1", "true", "yes"),
+    "threshold_ms": float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "500")),
+    "explain": os.getenv("SLOW_QUERY_EXPLAIN", "false").lower() in ("1", "true", "yes"),
+}
+_settings_lock = threading.Lock()
+
+# Most recent slow statements, newest last.
+recent = deque(maxlen=int(os.getenv("SLOW_QUERY_RECENT_ENTRIES", "100")))
+
+# Only plain DML/queries are explained; PL/SQL blocks, savepoints etc. are not.
+EXPLAINABLE_VERBS = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "MERGE")
+
+logger = logging.getLogger("slow_query")
+logger.propagate = False
+if not logger.handlers:
+    _path = os.getenv("SLOW_QUERY_LOG_PATH")
+    _handler = logging.FileHandler(_path) if _path else logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+
+def configure(enabled=None, threshold_ms=None, explain=None):
+    """Updates the given settings (None leaves one unchanged) and returns the new settings."""
+    with _settings_lock:
+        if enabled is not None:
+            settings["enabled"] = enabled
+        if threshold_ms is not None:
+            settings["threshold_ms"] = threshold_ms
+        if explain is not None:
+            settings["explain"] = explain
+        return dict(settings)
+
+
+def bind_count(binds):
+    """Number of bind values; for executemany(), per row times the number of rows."""
+    if not binds:
+        return 0
+    if isinstance(binds, list):
+        return len(binds) * bind_count(binds[0])
+    return len(binds)
+
+
+def observe(cur, sql, binds, elapsed, rows):
+    """Logs the statement if it took longer than the threshold. `cur` is the raw DB cursor."""
+    if not settings["enabled"] or elapsed * 1000 < settings["threshold_ms"]:
+        return
+    entry = {
+        "event": "slow_query",
+        "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "elapsed_ms": round(elapsed * 1000, 3),
+        "rows": rows,
+        "bind_count": bind_count(binds),
+        "sql": " ".join(sql.split()),
+    }
+    if settings["explain"]:
+        entry["plan"] = explain(cur, sql, binds)
+    recent.append(entry)
+    logger.info(json.dumps(entry, default=str))
+
+
+def explain(cur, sql, binds):
+    """Execution plan lines for `sql`, from a separate cursor so the caller's cursor is untouched."""
+    words = sql.split(None, 1)
+    if not words or words[0].upper() not in EXPLAINABLE_VERBS:
+        return None
+    if isinstance(binds, list):
+        binds = binds[0] if binds else None
+    plan_cur = None
+    try:
+        plan_cur = cur.connection.cursor()
+        return storage.get_backend().explain(plan_cur, sql, binds or {})
+    except Exception as e:
+        message = " ".join(str(e).split())
+        return [f"EXPLAIN failed: {type(e).__name__}: {message}"]
+    finally:
+        if plan_cur: plan_cur.close()
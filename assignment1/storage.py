@@ -0,0 +1,466 @@
+# storage.py
+"""
+Pluggable storage backends.
+
+The API, migrations and maintenance code talk to the database through the backend chosen by
+STORAGE_BACKEND: "oracle" (default; python-oracledb connection pool) or "sqlite" (embedded
+SQLite file in WAL mode, for branch machines and local benchmarks). Both use the same named
+`:bind` style; the few places where the SQL dialects differ go through the shims here
+(month formatting, row limits, DDL, upserts, RETURNING ids and per-row batch errors).
+"""
+import os
+import queue
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+
+try:
+    import oracledb
+except ImportError:  # Optional: SQLite-only installations do not need the Oracle driver
+    oracledb = None
+
+# Error code used by every backend for a claim whose policyholder does not exist
+# (Oracle's ORA-02291, integrity constraint violated - parent key not found).
+FOREIGN_KEY_VIOLATION = 2291
+
+# ORA-00001, unique constraint violated.
+UNIQUE_VIOLATION = 1
+
+
+class PoolTimeout(Exception):
+    """No pooled connection became free within the acquire timeout."""
+
+
+class PoolClosed(Exception):
+    """The pool has been closed; the backend opens a new one on the next acquire."""
+
+
+# Exception classes to catch around database work, whichever backend is active.
+DatabaseError = (sqlite3.DatabaseError,) + ((oracledb.DatabaseError,) if oracledb else ())
+Error = (sqlite3.Error, PoolTimeout, PoolClosed) + ((oracledb.Error,) if oracledb else ())
+
+
+def error_info(exc):
+    """Returns (code, message) for a database exception from any backend."""
+    if oracledb and isinstance(exc, oracledb.DatabaseError):
+        error_obj, = exc.args
+        return error_obj.code, error_obj.message
+    message = str(exc)
+    if isinstance(exc, sqlite3.IntegrityError) and "FOREIGN KEY" in message:
+        return FOREIGN_KEY_VIOLATION, message
+    return getattr(exc, "sqlite_errorcode", 0), message
+
+
+# --- Oracle ---
+class OracleBackend:
+    name = "oracle"
+    types = {
+        "id_pk": "NUMBER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY",
+        "integer": "NUMBER",
+        "decimal": "NUMBER",
+        "flag": "NUMBER(1)",
+        "date": "DATE",
+        "text20": "VARCHAR2(20)",
+        "text100": "VARCHAR2(100)",
+        "text200": "VARCHAR2(200)",
+        "text255": "VARCHAR2(255)",
+        "now": "SYSDATE",
+    }
+    # ORA-00955: name is already used by an existing object
+    # ORA-01408: such column list already indexed
+    # ORA-14427: table does not support modification to a partitioned state (already partitioned)
+    ALREADY_EXISTS_CODES = (955, 1408, 14427)
+
+    def __init__(self, user, password, dsn, pool_min=2, pool_max=10, pool_increment=1, acquire_timeout_ms=5000):
+        if oracledb is None:
+            raise RuntimeError("STORAGE_BACKEND=oracle requires the 'oracledb' package.")
+        self.user = user
+        self.password = password
+        self.dsn = dsn
+        self.pool_min = pool_min
+        self.pool_max = pool_max
+        self.pool_increment = pool_increment
+        self.acquire_timeout_ms = acquire_timeout_ms
+        self._pool = None
+        self._lock = threading.Lock()
+
+    # Connections
+    def open(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = oracledb.create_pool(
+                    user=self.user, password=self.password, dsn=self.dsn,
+                    min=self.pool_min, max=self.pool_max, increment=self.pool_increment,
+                    getmode=oracledb.POOL_GETMODE_TIMEDWAIT,
+                    wait_timeout=self.acquire_timeout_ms
+                )
+        return self._pool
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.close(force=True)
+                self._pool = None
+
+    def acquire(self):
+        """Borrows a pooled connection; closing it returns it to the pool."""
+        return (self._pool or self.open()).acquire()
+
+    def connect(self):
+        """A standalone connection for migrations and command-line maintenance."""
+        return oracledb.connect(user=self.user, password=self.password, dsn=self.dsn)
+
+    def stats(self):
+        return {
+            "min": self.pool_min,
+            "max": self.pool_max,
+            "increment": self.pool_increment,
+            "acquire_timeout_ms": self.acquire_timeout_ms,
+            "open": self._pool.opened if self._pool else 0,
+            "busy": self._pool.busy if self._pool else 0,
+        }
+
+    # Dialect shims
+    def month(self, column):
+        return f"TO_CHAR({column}, 'YYYY-MM')"
+
+    def limit(self, bind):
+        return f"FETCH FIRST :{bind} ROWS ONLY"
+
+    def epoch_days(self, column):
+        """Whole days from 1970-01-01 to the date in `column`."""
+        return f"(TRUNC({column}) - DATE '1970-01-01')"
+
+    def ddl(self, statement):
+        """Wraps a DDL statement so re-running it against an existing object is a no-op."""
+        escaped = statement.strip().replace("'", "''")
+        codes = " AND ".join(f"SQLCODE != -{code}" for code in self.ALREADY_EXISTS_CODES)
+        return f"""
+        BEGIN
+            EXECUTE IMMEDIATE '{escaped}';
+        EXCEPTION
+            WHEN OTHERS THEN
+                IF {codes} THEN
+                    RAISE;
+                END IF;
+        END;
+        """
+
+    def tune_cursor(self, cur, arraysize):
+        cur.arraysize = arraysize
+        cur.prefetchrows = arraysize
+
+    def fetch_numbers_as_floats(self, cur):
+        """Fetches NUMBER columns as native doubles instead of Python int/Decimal conversions."""
+        def handler(cursor, metadata):
+            if metadata.type_code is oracledb.DB_TYPE_NUMBER:
+                return cursor.var(oracledb.DB_TYPE_BINARY_DOUBLE, arraysize=cursor.arraysize)
+        cur.outputtypehandler = handler
+
+    def insert_returning_id(self, cur, sql, binds):
+        """Runs an INSERT and returns the generated id."""
+        id_var = cur.var(oracledb.NUMBER)
+        cur.execute(f"{sql} RETURNING id INTO :out_id", {**binds, 'out_id': id_var})
+        result = id_var.getvalue()
+        return result[0] if result else None
+
+    def insert_many_returning_ids(self, cur, sql, rows):
+        """
+        Array INSERT of `rows`. Returns (ids, errors): the generated id per row (None where
+        the row failed) and (offset, code, message) for each failed row.
+        """
+        id_var = cur.var(oracledb.NUMBER, arraysize=len(rows))
+        cur.setinputsizes(out_id=id_var)
+        cur.executemany(f"{sql} RETURNING id INTO :out_id", rows, batcherrors=True)
+        errors = [(e.offset, e.code, e.message) for e in cur.getbatcherrors()]
+        failed = {offset for offset, _, _ in errors}
+        ids = [None if offset in failed else id_var.getvalue(offset)[0] for offset in range(len(rows))]
+        return ids, errors
+
+    def executemany_collect_errors(self, cur, sql, rows):
+        """executemany() that keeps going past bad rows; returns (offset, code, message) per failure."""
+        cur.executemany(sql, rows, batcherrors=True)
+        return [(e.offset, e.code, e.message) for e in cur.getbatcherrors()]
+
+    def upsert_many(self, cur, sql, rows):
+        """
+        executemany() of a MERGE whose target row may be inserted concurrently: when two
+        sessions both take the NOT MATCHED branch for a new key, the second gets ORA-00001 once
+        the first commits. Those rows are run again, and now match the committed row.
+        """
+        cur.executemany(sql, rows, batcherrors=True)
+        errors = cur.getbatcherrors()
+        for error in errors:
+            if error.code != UNIQUE_VIOLATION:
+                raise oracledb.DatabaseError(error)
+        for error in errors:
+            cur.execute(sql, rows[error.offset])
+
+    def explain(self, cur, sql, binds):
+        """Plan lines for `sql`; EXPLAIN PLAN needs no bind values."""
+        cur.execute(f"EXPLAIN PLAN FOR {sql}")
+        cur.execute("SELECT plan_table_output FROM TABLE(DBMS_XPLAN.DISPLAY())")
+        return [row[0] for row in cur.fetchall()]
+
+
+# --- SQLite ---
+def _adapt_date(value):
+    return f"{value.isoformat()} 00:00:00"
+
+
+def _adapt_datetime(value):
+    return value.isoformat(" ", "seconds")
+
+
+def _convert_date(raw):
+    return datetime.fromisoformat(raw.decode())
+
+
+# DATE columns hold 'YYYY-MM-DD HH:MM:SS' text, so stored values and date binds compare correctly
+# as strings, and read back as datetime objects like Oracle DATE columns do.
+sqlite3.register_adapter(date, _adapt_date)
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_converter("DATE", _convert_date)
+
+
+class _PooledSQLiteConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() hands it back to its pool, like an oracledb pooled one."""
+    pool = None
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
+
+    def really_close(self):
+        super().close()
+
+
+class SQLitePool:
+    def __init__(self, path, max_size, acquire_timeout_ms):
+        self.path = path
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout_ms / 1000
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.busy = 0
+        self._closed = False
+
+    def acquire(self):
+        if self._closed:
+            raise PoolClosed("The SQLite connection pool is closed.")
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._closed:
+                    raise PoolClosed("The SQLite connection pool is closed.")
+                grow = self.opened < self.max_size
+                if grow:
+                    self.opened += 1
+            if grow:
+                try:
+                    conn = SQLiteBackend.new_connection(self.path)
+                except Exception:
+                    with self._lock:
+                        self.opened -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.acquire_timeout)
+                except queue.Empty:
+                    raise PoolTimeout("Timed out waiting for a free SQLite connection.")
+        conn.pool = self
+        with self._lock:
+            self.busy += 1
+        return conn
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self.busy -= 1
+            # Queued under the lock so close() cannot miss a connection released as it runs.
+            if not self._closed:
+                self._idle.put(conn)
+                return
+            self.opened -= 1
+        conn.really_close()
+
+    def close(self):
+        """Closes the idle connections now, and busy ones as they are released."""
+        idle = []
+        with self._lock:
+            self._closed = True
+            while True:
+                try:
+                    idle.append(self._idle.get_nowait())
+                except queue.Empty:
+                    break
+            self.opened -= len(idle)
+        for conn in idle:
+            conn.really_close()
+
+
+class SQLiteBackend:
+    name = "sqlite"
+    types = {
+        "id_pk": "INTEGER PRIMARY KEY AUTOINCREMENT",
+        "integer": "INTEGER",
+        "decimal": "REAL",
+        "flag": "INTEGER",
+        "date": "DATE",
+        "text20": "VARCHAR(20)",
+        "text100": "VARCHAR(100)",
+        "text200": "VARCHAR(200)",
+        "text255": "VARCHAR(255)",
+        "now": "CURRENT_TIMESTAMP",
+    }
+
+    def __init__(self, path, pool_max=10, acquire_timeout_ms=5000):
+        self.path = path
+        self.pool_max = pool_max
+        self.acquire_timeout_ms = acquire_timeout_ms
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_connection(path, factory=_PooledSQLiteConnection):
+        conn = sqlite3.connect(path, timeout=30.0, detect_types=sqlite3.PARSE_DECLTYPES,
+                               check_same_thread=False, factory=factory)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    # Connections
+    def open(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = SQLitePool(self.path, self.pool_max, self.acquire_timeout_ms)
+        return self._pool
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
+
+    def acquire(self):
+        return (self._pool or self.open()).acquire()
+
+    def connect(self):
+        return self.new_connection(self.path, factory=sqlite3.Connection)
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "max": self.pool_max,
+            "acquire_timeout_ms": self.acquire_timeout_ms,
+            "open": self._pool.opened if self._pool else 0,
+            "busy": self._pool.busy if self._pool else 0,
+        }
+
+    # Dialect shims
+    def month(self, column):
+        return f"strftime('%Y-%m', {column})"
+
+    def limit(self, bind):
+        return f"LIMIT :{bind}"
+
+    def epoch_days(self, column):
+        return f"CAST(julianday(date({column})) - 2440587.5 AS INTEGER)"
+
+    def ddl(self, statement):
+        return re.sub(r"^\s*CREATE (TABLE|INDEX) ", r"CREATE \1 IF NOT EXISTS ", statement, count=1)
+
+    def tune_cursor(self, cur, arraysize):
+        cur.arraysize = arraysize
+
+    def fetch_numbers_as_floats(self, cur):
+        pass  # sqlite3 already returns native int/float values
+
+    def insert_returning_id(self, cur, sql, binds):
+        cur.execute(sql, binds)
+        return cur.lastrowid
+
+    def insert_many_returning_ids(self, cur, sql, rows):
+        # In-process inserts are cheap, so rows go one at a time to get each id and error.
+        ids = []
+        errors = []
+        for offset, row in enumerate(rows):
+            try:
+                cur.execute(sql, row)
+                ids.append(cur.lastrowid)
+            except sqlite3.DatabaseError as e:
+                ids.append(None)
+                errors.append((offset, *error_info(e)))
+        return ids, errors
+
+    def executemany_collect_errors(self, cur, sql, rows):
+        # Fast path: the whole batch in one executemany(); on failure redo it row by row.
+        cur.execute("SAVEPOINT batch")
+        try:
+            cur.executemany(sql, rows)
+            cur.execute("RELEASE SAVEPOINT batch")
+            return []
+        except sqlite3.DatabaseError:
+            cur.execute("ROLLBACK TO SAVEPOINT batch")
+            cur.execute("RELEASE SAVEPOINT batch")
+        errors = []
+        for offset, row in enumerate(rows):
+            try:
+                cur.execute(sql, row)
+            except sqlite3.DatabaseError as e:
+                errors.append((offset, *error_info(e)))
+        return errors
+
+    def upsert_many(self, cur, sql, rows):
+        # Writers are serialized and ON CONFLICT resolves existing keys, so there is no race.
+        cur.executemany(sql, rows)
+
+    def explain(self, cur, sql, binds):
+        cur.execute(f"EXPLAIN QUERY PLAN {sql}", binds)
+        return [row[-1] for row in cur.fetchall()]
+
+
+# --- Configuration ---
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "oracle")
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_backend(name=None):
+    name = name or STORAGE_BACKEND
+    if name == "oracle":
+        return OracleBackend(
+            user=os.getenv("DB_USER", "system"),
+            password=os.getenv("DB_PASSWORD", "shardul"),
+            dsn=os.getenv("DB_DSN", "localhost:1521/FREE"),
+            pool_min=int(os.getenv("DB_POOL_MIN", "2")),
+            pool_max=int(os.getenv("DB_POOL_MAX", "10")),
+            pool_increment=int(os.getenv("DB_POOL_INCREMENT", "1")),
+            acquire_timeout_ms=int(os.getenv("DB_POOL_ACQUIRE_TIMEOUT_MS", "5000"))
+        )
+    if name == "sqlite":
+        return SQLiteBackend(
+            path=os.getenv("SQLITE_PATH", "claims.db"),
+            pool_max=int(os.getenv("DB_POOL_MAX", "10")),
+            acquire_timeout_ms=int(os.getenv("DB_POOL_ACQUIRE_TIMEOUT_MS", "5000"))
+        )
+    raise ValueError(f"Unknown STORAGE_BACKEND '{name}' (expected 'oracle' or 'sqlite').")
+
+
+def get_backend():
+    """The process-wide backend selected by configuration."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend()
+    return _backend
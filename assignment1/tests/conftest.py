@@ -0,0 +1,57 @@
+# tests/conftest.py
+"""
+Shared fixtures: one seeded SQLite database per test session, installed as storage's
+process-wide backend so api, risk_state and the spawned parallel risk workers all use it.
+"""
+import pytest
+
+import migrations
+import risk_rules
+import storage
+from benchmarks import generate
+
+CLAIMS = 3000
+
+
+@pytest.fixture(scope="session")
+def backend(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("db") / "claims.db")
+    with pytest.MonkeyPatch.context() as mp:
+        # Spawned workers pick their backend up from the environment.
+        mp.setenv("STORAGE_BACKEND", "sqlite")
+        mp.setenv("SQLITE_PATH", path)
+        mp.delenv("RISK_RULES_PATH", raising=False)
+        mp.setattr(risk_rules, "active", risk_rules.RuleSet())
+        backend = storage.SQLiteBackend(path)
+        mp.setattr(storage, "_backend", backend)
+        conn = backend.connect()
+        try:
+            migrations.migrate(conn, backend=backend)
+            generate.generate(conn, CLAIMS, seed=7)
+        finally:
+            conn.close()
+        yield backend
+        backend.close()
+
+
+@pytest.fixture(scope="session")
+def client(backend):
+    """A TestClient for the API on the seeded database; its startup and shutdown run once."""
+    testclient = pytest.importorskip("fastapi.testclient")  # Needs httpx
+    import api
+    with testclient.TestClient(api.app) as client:
+        yield client
+
+
+@pytest.fixture
+def conn(backend):
+    conn = backend.connect()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def cur(conn):
+    cur = conn.cursor()
+    yield cur
+    cur.close()
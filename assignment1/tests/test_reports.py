@@ -0,0 +1,101 @@
+# tests/test_reports.py
+"""
+/reports/ reads monthly figures from claims_monthly_rollup, which claim writes maintain
+incrementally; after writes through /claims/ and /claims/bulk it must still agree with the
+same figures recomputed straight from the claims table.
+"""
+from datetime import date
+
+import pytest
+
+
+def recompute(cur, from_month=None, to_month=None):
+    """The /reports/ response computed in Python from every claim row."""
+    cur.execute("""
+        SELECT c.id, c.amount, c.policyholder_id, c.status, c.date_of_claim, p.policy_type, p.name
+        FROM claims c JOIN policyholders p ON p.id = c.policyholder_id
+    """)
+    claims = [
+        row for row in cur.fetchall()
+        if (from_month is None or row[4].strftime('%Y-%m') >= from_month)
+        and (to_month is None or row[4].strftime('%Y-%m') <= to_month)
+    ]
+    per_month = {}
+    approved_amounts = {}
+    pending = {}
+    for claim_id, amount, ph_id, status, claim_date, policy_type, name in claims:
+        month = claim_date.strftime('%Y-%m')
+        per_month[month] = per_month.get(month, 0) + 1
+        if status == 'Approved':
+            approved_amounts.setdefault(policy_type, []).append(amount)
+        if status == 'Pending':
+            pending[ph_id] = name
+    cur.execute("SELECT DISTINCT policy_type FROM policyholders")
+    policy_types = [row[0] for row in cur.fetchall()]
+    highest = max(claims, key=lambda row: row[1], default=None)
+    return {
+        'claims_per_month': per_month,
+        'avg_claim_by_type': {
+            policy_type: round(sum(approved_amounts[policy_type]) / len(approved_amounts[policy_type]), 2)
+            if policy_type in approved_amounts else 0
+            for policy_type in policy_types
+        },
+        'highest_claim': {'id': highest[0], 'amount': highest[1], 'policyholder_id': highest[2]} if highest else None,
+        'policyholders_with_pending_claims': sorted(pending.values()),
+    }
+
+
+def assert_report_matches(client, cur, **period):
+    response = client.get("/reports/", params=period)
+    assert response.status_code == 200
+    report = response.json()
+    expected = recompute(cur, **period)
+    assert report['claims_per_month'] == expected['claims_per_month']
+    assert report['avg_claim_by_type'] == pytest.approx(expected['avg_claim_by_type'], abs=0.01)
+    assert report['highest_claim'] == expected['highest_claim']
+    assert sorted(report['policyholders_with_pending_claims']) == expected['policyholders_with_pending_claims']
+
+
+def claim(policyholder_id, amount, status, claim_date):
+    return {
+        "policyholder_id": policyholder_id, "amount": amount, "reason": "Report consistency",
+        "status": status, "date_of_claim": claim_date.isoformat()
+    }
+
+
+@pytest.fixture(scope="module")
+def written_claims(client):
+    """Claims written through the API into existing and new months, and a new policy type."""
+    holder = client.post("/policyholders/", json={
+        "name": "Report Writer", "age": 52, "policy_type": "Travel", "sum_insured": 90_000_000
+    }).json()
+    today = date.today()
+    created = client.post("/claims/", json=claim(holder["id"], 75_000_000, "Approved", today))
+    assert created.status_code == 201
+    bulk = client.post("/claims/bulk", json=[
+        claim(holder["id"], 120.5, "Pending", date(2001, 3, 14)),
+        claim(holder["id"], 99.99, "Approved", date(2001, 3, 31)),
+        claim(holder["id"], 310, "Rejected", today),
+        claim(10 ** 9, 50, "Approved", today),  # No such policyholder: rejected, so not rolled up
+    ])
+    assert bulk.status_code == 201
+    assert bulk.json()["inserted"] == 3
+    return today
+
+
+def test_report_matches_claims_table(client, cur, written_claims):
+    assert_report_matches(client, cur)
+
+
+@pytest.mark.parametrize("months_back", [(None, 0), (3, 1), (0, None)])
+def test_month_range_matches_claims_table(client, cur, written_claims, months_back):
+    def month(back):
+        if back is None:
+            return None
+        year, month_index = divmod(written_claims.year * 12 + written_claims.month - 1 - back, 12)
+        return f"{year:04d}-{month_index + 1:02d}"
+    assert_report_matches(client, cur, from_month=month(months_back[0]), to_month=month(months_back[1]))
+
+
+def test_old_month_range_matches_claims_table(client, cur, written_claims):
+    assert_report_matches(client, cur, from_month="2001-01", to_month="2001-03")
@@ -0,0 +1,188 @@
+# tests/test_risk_equivalence.py
+"""
+Every /risk_analysis/ mode (full, state, vectorized, parallel) must produce the same report
+as the original per-policyholder scan, kept below as the reference. They run against a seeded
+SQLite database with the default risk rules.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, date
+
+import pytest
+
+import repository
+import risk
+import risk_parallel
+import risk_rules
+import risk_state
+import risk_vectorized
+
+
+def baseline_report(policyholders_data, all_claims_rows):
+    """The original O(policyholders x claims) algorithm of /risk_analysis/."""
+    one_year_ago_target_date = (datetime.now() - timedelta(days=365)).date()
+    policyholder_map = {
+        ph_id: {"name": name, "sum_insured": si, "policy_type": pt}
+        for ph_id, name, si, pt in policyholders_data
+    }
+
+    approved_by_type = defaultdict(int)
+    total_by_type = defaultdict(int)
+    for claim in all_claims_rows:
+        if claim[1] in policyholder_map:
+            policy_type = policyholder_map[claim[1]]["policy_type"]
+            total_by_type[policy_type] += 1
+            if claim[3] == 'Approved':
+                approved_by_type[policy_type] += 1
+
+    risk_report = []
+    high_risk_summary = []
+    for ph_id, ph_info in policyholder_map.items():
+        ph_claims = [claim for claim in all_claims_rows if claim[1] == ph_id]
+        insured = bool(ph_info["sum_insured"] and ph_info["sum_insured"] > 0)
+
+        if insured and any(c[3] == 'Rejected' and (c[2] / ph_info["sum_insured"]) > 0.80 for c in ph_claims):
+            risk_report.append({
+                'policyholder_id': ph_id, 'name': ph_info["name"],
+                'risk_status_message': "Risk assessment skipped: Policyholder has a rejected claim exceeding 80% of sum insured.",
+                'high_risk': False,
+                'reason': "A rejected claim >80% of sum insured exists."
+            })
+            continue
+
+        approved = [c for c in ph_claims if c[3] == 'Approved']
+        recent_count = 0
+        for c in approved:
+            claim_date = c[4].date() if isinstance(c[4], datetime) else c[4] if isinstance(c[4], date) else None
+            if claim_date and claim_date >= one_year_ago_target_date:
+                recent_count += 1
+
+        reasons = []
+        if recent_count > 3:
+            reasons.append(f"{recent_count} approved claims in the last year.")
+        if insured:
+            for c in approved:
+                if (c[2] / ph_info["sum_insured"]) > 0.80:
+                    reasons.append(f"An approved claim (ID: {c[0]}, Amount: {c[2]:.2f}) exceeds 80% of sum insured ({ph_info['sum_insured']:.2f}).")
+                    break
+
+        if reasons:
+            risk_report.append({
+                'policyholder_id': ph_id, 'name': ph_info["name"],
+                'risk_status_message': "High Risk", 'high_risk': True, 'reason': "; ".join(reasons)
+            })
+            high_risk_summary.append({
+                'policyholder_id': ph_id, 'name': ph_info["name"],
+                'reason_for_high_risk': "; ".join(reasons), 'recent_accepted_claims_count': recent_count
+            })
+        else:
+            risk_report.append({
+                'policyholder_id': ph_id, 'name': ph_info["name"],
+                'risk_status_message': "Standard Risk", 'high_risk': False,
+                'reason': "No high-risk conditions met based on approved claims."
+            })
+
+    return {
+        "risk_analysis_report": risk_report,
+        "high_risk_summary": high_risk_summary,
+        "claims_by_policy_type_approved": dict(approved_by_type),
+        "total_claims_by_policy_type": dict(total_by_type)
+    }
+
+
+def by_policyholder(report):
+    """The report with its lists in policyholder order, for modes that list in another order."""
+    return {
+        name: sorted(value, key=lambda entry: entry["policyholder_id"]) if isinstance(value, list) else value
+        for name, value in report.items()
+    }
+
+
+@pytest.fixture
+def baseline(cur):
+    return baseline_report(repository.risk_policyholders(cur), list(repository.risk_claims(cur)))
+
+
+def test_seed_covers_every_rule(baseline):
+    reasons = [entry["reason"] for entry in baseline["risk_analysis_report"]]
+    assert any(reason.startswith("A rejected claim") for reason in reasons)
+    assert any("approved claims in the last year" in reason for reason in reasons)
+    assert any("exceeds 80% of sum insured" in reason for reason in reasons)
+
+
+def test_full_matches_baseline(cur, baseline):
+    report = risk.evaluate_risk(repository.risk_policyholders(cur), repository.risk_claims(cur))
+    assert report == baseline
+    assert [e["policyholder_id"] for e in report["risk_analysis_report"]] == \
+        [e["policyholder_id"] for e in baseline["risk_analysis_report"]]
+
+
+def test_state_matches_baseline_after_rebuild(conn, cur, baseline):
+    risk_state.rebuild(conn)
+    assert by_policyholder(risk_state.load_report(cur)) == by_policyholder(baseline)
+
+
+def test_state_matches_baseline_when_applied_incrementally(conn, cur, baseline):
+    cur.execute("DELETE FROM policyholder_risk_state")
+    cur.execute("SELECT id, policyholder_id, amount, status, date_of_claim FROM claims ORDER BY id")
+    claims = cur.fetchall()
+    for start in range(0, len(claims), 500):
+        risk_state.apply_claims(cur, claims[start:start + 500])
+    conn.commit()
+    assert by_policyholder(risk_state.load_report(cur)) == by_policyholder(baseline)
+
+
+def test_vectorized_matches_baseline(cur, baseline):
+    if not risk_vectorized.available:
+        pytest.skip("numpy is not installed")
+    report = risk_vectorized.evaluate_risk(repository.risk_policyholders(cur), risk_vectorized.load_claim_columns(cur))
+    assert report == baseline
+
+
+def test_parallel_matches_baseline(cur, baseline):
+    executor = risk_parallel.create_executor(2)
+    try:
+        report = risk_parallel.evaluate_risk(executor, cur, shards=4, arraysize=500)
+    finally:
+        executor.shutdown()
+    assert by_policyholder(report) == by_policyholder(baseline)
+
+
+class Tomorrow(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return datetime.now(tz) + timedelta(days=1)
+
+
+def test_state_follows_the_window_across_a_day_rollover(client, conn, monkeypatch):
+    holder = client.post("/policyholders/", json={
+        "name": "Rollover", "age": 40, "policy_type": "Health", "sum_insured": 1_000_000
+    }).json()
+    today = date.today()
+    # Four recent approved claims today; the oldest leaves the 365-day window tomorrow.
+    for claim_date in (today - timedelta(days=365), today, today, today):
+        created = client.post("/claims/", json={
+            "policyholder_id": holder["id"], "amount": 100, "reason": "Routine check-up",
+            "status": "Approved", "date_of_claim": claim_date.isoformat()
+        })
+        assert created.status_code == 201
+
+    def entry(mode):
+        report = client.get("/risk_analysis/", params={"mode": mode}).json()
+        return report, next(e for e in report["risk_analysis_report"] if e["policyholder_id"] == holder["id"])
+
+    state, state_entry = entry("state")
+    full, full_entry = entry("full")
+    assert state_entry["high_risk"] and full_entry["high_risk"]
+    assert by_policyholder(state) == by_policyholder(full)
+
+    window_start = risk.window_start
+    monkeypatch.setattr(risk_rules, "datetime", Tomorrow)
+    monkeypatch.setattr(risk, "window_start", lambda now=None, days=risk.WINDOW_DAYS: window_start(now or Tomorrow.now(), days))
+    try:
+        state, state_entry = entry("state")
+        full, full_entry = entry("full")
+        assert not state_entry["high_risk"] and not full_entry["high_risk"]
+        assert by_policyholder(state) == by_policyholder(full)
+    finally:
+        monkeypatch.undo()
+        risk_state.rebuild(conn)  # Back to today's window for the other tests
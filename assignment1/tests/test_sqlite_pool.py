@@ -0,0 +1,46 @@
+# tests/test_sqlite_pool.py
+"""SQLitePool shutdown: connections busy at close() are closed when released, not requeued."""
+import sqlite3
+
+import pytest
+
+import storage
+
+
+@pytest.fixture
+def pool(tmp_path):
+    return storage.SQLitePool(str(tmp_path / "pool.db"), max_size=3, acquire_timeout_ms=100)
+
+
+def test_close_closes_idle_connections_and_later_releases(pool):
+    idle, busy = pool.acquire(), pool.acquire()
+    idle.close()  # Back to the pool
+    assert (pool.opened, pool.busy) == (2, 1)
+
+    pool.close()
+    assert (pool.opened, pool.busy) == (1, 1)
+    with pytest.raises(sqlite3.ProgrammingError):
+        idle.execute("SELECT 1")
+
+    busy.close()
+    assert (pool.opened, pool.busy) == (0, 0)
+    with pytest.raises(sqlite3.ProgrammingError):
+        busy.execute("SELECT 1")
+
+
+def test_acquire_after_close_raises(pool):
+    pool.close()
+    with pytest.raises(storage.PoolClosed):
+        pool.acquire()
+
+
+def test_backend_reopens_after_close(tmp_path):
+    backend = storage.SQLiteBackend(str(tmp_path / "backend.db"))
+    backend.acquire().close()
+    backend.close()
+    conn = backend.acquire()
+    try:
+        assert conn.execute("SELECT 1").fetchone() == (1,)
+    finally:
+        conn.close()
+        backend.close()